@@ -0,0 +1,35 @@
+#!/opt/bin/lv_micropython -i
+
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Compares group population from a panel's focus index against walking the tree
+
+import display_driver
+import lvgl as lv
+from time import ticks_us, ticks_diff
+from panels import CustomPanel, add_children_to_group
+
+COUNT = 120
+RUNS = 10
+
+def many_btns(parent):
+    parent.set_flex_flow(lv.FLEX_FLOW.ROW_WRAP)
+    for i in range(COUNT):
+        btn = lv.btn(parent)
+        lv.label(btn).set_text(str(i))
+    return False
+
+def bench(name, func):
+    start = ticks_us()
+    for _ in range(RUNS):
+        func()
+    print(f"{name}: {ticks_diff(ticks_us(), start) // RUNS} us")
+
+start = ticks_us()
+panel = CustomPanel(params=many_btns, parent=lv.scr_act(), root=True, animation=None)
+print(f"construct with {len(panel.focus_index)} focusable: {ticks_diff(ticks_us(), start)} us")
+
+bench("add_children_to_group", lambda: add_children_to_group(panel, lv.group_create()))
+bench("populate_group", lambda: panel.populate_group(lv.group_create()))
@@ -0,0 +1,36 @@
+#!/opt/bin/lv_micropython -i
+
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Steps focus through a HorizontalLivePanel with and without low refresh mode and
+# prints the number of invalidations and invalidated pixels for each.  Fails if low refresh
+# mode doesn't invalidate less.
+
+import display_driver
+import lvgl as lv
+from panels import HorizontalLivePanel, refresh
+from panels_demo_data import menu2
+
+STEPS = 20
+
+def run(low_refresh):
+    refresh.set_low_refresh(low_refresh)
+    panel = HorizontalLivePanel(params=menu2, parent=lv.scr_act(), root=True, animation=None)
+    lv.refr_now(None)
+    counter = refresh.InvalidationCounter()
+    for _ in range(STEPS):
+        panel.group.focus_next()
+        lv.task_handler()
+    lv.refr_now(None)
+    counter.stop()
+    panel.cleanup()
+    panel.delete()
+    print(f"low_refresh={low_refresh}: {counter.count} invalidations, {counter.area} px")
+    return counter.count
+
+normal = run(False)
+low = run(True)
+refresh.set_low_refresh(False)
+assert low < normal, f"low refresh mode made {low} invalidations, normal mode {normal}"
@@ -10,6 +10,7 @@ from sys import platform
 from panels import ListMenuPanel, MatrixMenuPanel, RoundMenuPanel, ZRoundMenuPanel
 from panels import CircularLivePanel, HorizontalLivePanel, VerticalLivePanel, TabViewLivePanel
 from panels import IndevManager, config
+from panels.base_panels import root_panels
 from encoders import EncoderIRQ, EncoderDisplay
 from panels_demo_data import main_menu, live_panels
 from tools.style_finder import StyleFinder
@@ -31,6 +32,8 @@ def tvlp_wrapper(*args, **kwargs):
 
 def set_rotate(e):
     config.rotate = (e.get_target_obj().get_state() & lv.STATE.CHECKED > 0)
+    for panel in root_panels(lv.disp_get_default()):
+        panel.apply_settings(rotate=config.rotate)
     print(f"{config.rotate}")
 
 btn_defs = [
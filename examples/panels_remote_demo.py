@@ -0,0 +1,47 @@
+#!/opt/bin/lv_micropython -i
+
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Drives a LivePanel's gauges, slider and label through RemoteDispatcher.  An io.BytesIO
+# stands in for the UART; on a board pass a machine.UART created with timeout=0 instead.
+# The id table printed first is what the host uses to address the panels.
+
+import display_driver
+import lvgl as lv
+import io
+from random import randint
+from panels import HorizontalLivePanel, GaugeGridPanel, LabelPanel, SliderPanel
+from panels import IndevManager, RemoteDispatcher, encode_frame, menu_ids
+from panels.remote import make_id
+
+menu = [
+    ("Gauges", lv.SYMBOL.SETTINGS, GaugeGridPanel, (4, (0, 99)), None),
+    ("Level", lv.SYMBOL.SETTINGS, SliderPanel, (lambda: 0, (0, 100)), None),
+    ("Status", lv.SYMBOL.SETTINGS, LabelPanel, ("Waiting", False), None),
+]
+
+for id, path in menu_ids(menu).items():
+    print(f"{id:5} {'/'.join(path)}")
+
+panel = HorizontalLivePanel(params=menu, parent=lv.scr_act(), idm=IndevManager([]), root=True)
+stream = io.BytesIO()
+dispatcher = RemoteDispatcher(stream)
+gauges, level, status = make_id(("Gauges",)), make_id(("Level",)), make_id(("Status",))
+
+def send(timer):
+    # What the host would write to the UART each frame
+    updates = [(gauges, i + 1, randint(0, 99)) for i in range(4)]
+    updates += [(level, 0, randint(0, 100)), (status, 0, f"Frame {send.count}")]
+    send.count += 1
+    stream.seek(0)
+    stream.truncate()
+    stream.write(encode_frame(updates))
+    stream.seek(0)
+send.count = 0
+
+timer = lv.timer_create_basic()
+timer.set_period(100)
+timer.set_repeat_count(-1)
+timer.set_cb(send)
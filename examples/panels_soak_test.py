@@ -0,0 +1,90 @@
+#!/opt/bin/lv_micropython -i
+
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Opens and closes every panel in live_panels, and the live panel containers that hold them all,
+# many times and reports how much heap, how many LVGL objects, groups and timers each leaves
+# behind per cycle.  Exits with status 1 if any leaks more than the thresholds.
+#   panels_soak_test.py [cycles]
+
+import display_driver
+import lvgl as lv
+import gc
+import sys
+from panels import IndevManager, config
+from panels import CircularLivePanel, HorizontalLivePanel, VerticalLivePanel, TabViewLivePanel
+from panels.menu_panels import is_panel_class
+from panels_demo_data import live_panels
+
+cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+warmup = 5  # Cycles run before measuring, so caches and interned strings aren't counted
+max_bytes = 16  # Leak thresholds per cycle
+max_objs = 0
+max_groups = 0
+max_timers = 0
+
+def count_objs(obj):
+    count = 1
+    for i in range(obj.get_child_cnt()):
+        count += count_objs(obj.get_child(i))
+    return count
+
+def count_timers():
+    count = 0
+    timer = lv.timer_get_next(None)
+    while timer:
+        count += 1
+        timer = lv.timer_get_next(timer)
+    return count
+
+def snapshot():
+    gc.collect()
+    return (
+        gc.mem_free(),
+        count_objs(scr) + count_objs(lv.layer_top()),
+        lv.group_get_count(),
+        count_timers(),
+    )
+
+def cycle(cls, title, icon, params, callback):
+    panel = cls(parent=scr, idm=idm, title=title, icon=icon, params=params, callback=callback, animation=None)
+    lv.task_handler()
+    panel.cleanup()
+    panel.delete()
+    lv.task_handler()  # Let timers stopped by cleanup() be deleted
+
+scr = lv.scr_act()
+idm = IndevManager([])
+failed = []
+
+# The containers, as opened from the main demo, then each panel in them.  A class is measured
+# once per distinct params, since params decide which widgets and timers are built.
+containers = [
+    ("Live Menu", config.default_icon, cls, live_panels, None)
+    for cls in (CircularLivePanel, HorizontalLivePanel, VerticalLivePanel, TabViewLivePanel)
+]
+tested = set()
+for title, icon, cls, params, callback in containers + live_panels:
+    if not is_panel_class(cls) or (cls, id(params)) in tested:
+        continue
+    tested.add((cls, id(params)))
+    name = f"{cls.__name__} ({title})".replace("\n", " ")
+    for _ in range(warmup):
+        cycle(cls, title, icon, params, callback)
+    before = snapshot()
+    for _ in range(cycles):
+        cycle(cls, title, icon, params, callback)
+    after = snapshot()
+
+    bytes_ = (before[0] - after[0]) / cycles  # Free memory shrinks when leaking, the counts grow
+    objs, groups, timers = [(a - b) / cycles for a, b in zip(after[1:], before[1:])]
+    print(f"{name}: {bytes_:.1f} bytes, {objs:.2f} objs, {groups:.2f} groups, {timers:.2f} timers per cycle")
+    if bytes_ > max_bytes or objs > max_objs or groups > max_groups or timers > max_timers:
+        failed.append(name)
+
+if failed:
+    print(f"Leaking: {', '.join(failed)}")
+    sys.exit(1)
+print(f"No leaks over {cycles} cycles")
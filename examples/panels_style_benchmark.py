@@ -0,0 +1,53 @@
+#!/opt/bin/lv_micropython -i
+
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Compares the heap used by the per-subpanel style tweaks of TabViewLivePanel when set as
+# local styles and when attached as shared styles, then reports the cost per subpanel of
+# a whole TabViewLivePanel built from live_panels.
+
+import display_driver
+import lvgl as lv
+import gc
+from panels import TabViewLivePanel, IndevManager
+from panels.shared_styles import no_pad, square
+from panels_demo_data import live_panels
+
+count = 50
+
+def measure(func):
+    gc.collect()
+    before = gc.mem_free()
+    result = func()
+    gc.collect()
+    return before - gc.mem_free(), result
+
+def tab_and_panel(parent, shared):
+    # A tab with a subpanel in it, as TabViewLivePanel lays them out
+    tab = lv.obj(parent)
+    panel = lv.obj(tab)
+    if shared:
+        tab.add_style(no_pad(), 0)
+        panel.add_style(square(), 0)
+    else:
+        tab.set_style_pad_all(0, 0)
+        panel.set_style_radius(0, 0)
+    return tab
+
+scr = lv.scr_act()
+no_pad(), square()  # Create the shared styles before measuring
+
+base, objs = measure(lambda: [lv.obj(lv.obj(scr)).get_parent() for _ in range(count)])
+for obj in objs: obj.delete()
+for shared in (False, True):
+    used, objs = measure(lambda: [tab_and_panel(scr, shared) for _ in range(count)])
+    print(f"{'Shared' if shared else 'Local'} styles: {(used - base) / count:.1f} bytes per subpanel for the tweaks")
+    for obj in objs: obj.delete()
+
+idm = IndevManager([])
+used, panel = measure(lambda: TabViewLivePanel(params=live_panels, parent=scr, idm=idm, root=True, animation=None))
+print(f"TabViewLivePanel: {used / len(panel.subpanels):.0f} bytes per subpanel")
+panel.cleanup()
+panel.delete()
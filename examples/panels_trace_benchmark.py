@@ -0,0 +1,37 @@
+#!/opt/bin/lv_micropython -i
+
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Times a scripted navigation session through main_menu and live_panels using a virtual
+# encoder, so builds can be compared.  Pass a trace file recorded with InputRecorder to
+# replay a real session instead of the script.
+
+import display_driver
+import lvgl as lv
+import sys
+from panels import RoundMenuPanel, HorizontalLivePanel, IndevManager, InputReplayer, load_trace
+from panels_demo_data import main_menu, live_panels
+
+def scripted_trace():
+    # Open each main menu item, step through its items and go back
+    trace = []
+    for item in range(len(main_menu)):
+        trace += [(0, 0, 1, False)] * item
+        trace += [(0, 0, 0, True), (0, 0, 0, False)]
+        trace += [(0, 0, 1, False)] * 6
+        trace += [(0, 0, -6, False), (0, 0, 0, True), (0, 0, 0, False)]
+        trace += [(0, 0, -item, False)] if item else []
+    return trace
+
+trace = load_trace(sys.argv[1]) if len(sys.argv) > 1 else scripted_trace()
+
+for cls, menu in ((RoundMenuPanel, main_menu), (HorizontalLivePanel, live_panels)):
+    idm = IndevManager([])
+    panel = cls(params=menu, parent=lv.scr_act(), idm=idm, root=True, animation=None)
+    replayer = InputReplayer(idm, trace)
+    print(f"{cls.__name__}: {len(trace)} samples in {replayer.run()} ms")
+    replayer.close()
+    panel.cleanup()
+    panel.delete()
@@ -0,0 +1,41 @@
+#!/opt/bin/lv_micropython -i
+
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Runs the same panel on two displays with different sessions.  The second display is a
+# simulated slow SPI screen that only counts its flushes.  After a few seconds the flush
+# counts show each display refreshing at its own cadence.
+
+import display_driver
+import lvgl as lv
+from time import sleep_ms
+from panels import Session, AnalogClockPanel
+
+fast = lv.disp_get_default()
+flushes = {fast: 0}
+
+slow = lv.disp_create(240, 240)
+buf = bytearray(240 * 24 * lv.color_t.__SIZE__)
+slow.set_draw_buffers(buf, None, len(buf), lv.DISP_RENDER_MODE.PARTIAL)
+flushes[slow] = 0
+
+def slow_flush(disp, area, color_p):
+    flushes[disp] += 1
+    disp.flush_ready()
+
+slow.set_flush_cb(slow_flush)
+
+fast_session = Session(fast, animation=None)
+slow_session = Session(slow, refresh_period=500, gc_every=10, animation=None, rotate=False)
+
+AnalogClockPanel(parent=fast.get_scr_act(), root=True)
+AnalogClockPanel(parent=slow.get_scr_act(), root=True)
+
+fast.add_event(lambda e: flushes.__setitem__(fast, flushes[fast] + 1), lv.EVENT.FLUSH_START, None)
+
+for _ in range(50):
+    lv.task_handler()
+    sleep_ms(100)
+print(f"fast display flushes: {flushes[fast]}, slow display flushes: {flushes[slow]}")
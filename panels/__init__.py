@@ -4,8 +4,9 @@
 
 import lvgl as lv
 import styles
-from . import config
+from . import config, refresh
 apply_styles = config.apply_styles
+from .session import Session, session_for
 from tools.indevs import IndevManager, add_children_to_group
 from .base_panels import (
     _BasePanel,
@@ -17,7 +18,9 @@ from .widget_panels import (
     BtnMatrixPanel,
     BtnPanel,
     CalendarPanel,
+    ChartPanel,
     ColorWheelPanel,
+    GaugeGridPanel,
     LabelPanel,
     ListPanel,
     RollerPanel,
@@ -36,3 +39,11 @@ from .live_panels import(
     VerticalLivePanel,
     TabViewLivePanel,
 )
+from .monitor import PanelMonitor
+from .manager import PanelManager
+from .trace import InputRecorder, InputReplayer, VirtualEncoder, load_trace
+from .resume import save_state, resume
+from .updates import UpdateQueue
+from .idle import IdleManager
+from .latency import LatencyTracker
+from .remote import RemoteDispatcher, encode_frame, menu_ids
@@ -3,8 +3,8 @@
 # SPDX-License-Identifier: MIT
 
 import lvgl as lv
-import gc
-from . import config, apply_styles, IndevManager, add_children_to_group
+from . import config, IndevManager
+from .session import session_for
 from tools.misc import add_btn, add_label, make_square
 
 
@@ -22,6 +22,8 @@ class _BasePanel(lv.obj):
     close_btn_label = config.close_btn_label
     close_btn_size = (lv.pct(15), lv.pct(15))
     warn = config.warn
+    value_type = int  # What .set_widget_value() converts values for .set_value() to
+    coalescer = None  # Set by focus.coalesced()
     
     def __init__(
         self,
@@ -41,13 +43,19 @@ class _BasePanel(lv.obj):
         icon=config.default_icon,
         size=(lv.pct(100), lv.pct(100)),
         alignment=(lv.ALIGN.CENTER, 0, 0),
+        session=None,
     ):
         super().__init__(parent)
-        if self.style_key is None: self.style_key = config.panel_style_key
-        self.callback = config.default_callback if callback is None else callback
-        self.rotate = config.rotate if rotate is None else rotate
-        self.animation = config.animation if animation == -1 else animation
+        if config.manager: config.manager.opening(self)
+        # Settings come from the session of the parent panel or display unless passed in
+        self.session = session = session if session else session_for(parent)
+        if self.style_key is None: self.style_key = session.panel_style_key
+        self.callback = session.default_callback if callback is None else callback
+        self.rotate = session.rotate if rotate is None else rotate
+        self.animation = session.animation if animation == -1 else animation
+        if session.low_refresh: self.animation = None
         self.group = group if group else lv.group_create()
+        self.owns_group = group is None  # LivePanels share their group with their subpanels
         if obj_size: self.obj_size = obj_size  # Size to set self.obj in .post_config()
         self.params = params  # paremeters for the obj
         self.parent = parent  #
@@ -65,8 +73,16 @@ class _BasePanel(lv.obj):
         self.close_btn = None  #   like MenuPanel rotate
         self.animations = []  # List of animations created by subclasses like AnalogClockPanel
         self.subpanels = []  # List of subpanels created by LivePanels
-
-        apply_styles(self)
+        self.opened_panels = []  # Panels opened on top of this one, for .apply_settings()
+        if isinstance(parent, _BasePanel): parent.opened_panels.append(self)
+        self.focus_index = []  # Focusable objects in focus order, built by .build_focus_index()
+        self.overrides = []  # (obj, style, selector) shared styles kept on top of the applied styles
+        self.idle = False  # Set by .set_idle()
+        self.active_periods = {}  # timer: period, saved by .set_idle()
+        self.configured = False  # Set by .post_config()
+
+        config.monitor(self)
+        session.apply_styles(self)
         self.align(*alignment)
         self.set_size(*self.size)
         self.clear_flag(lv.obj.FLAG.SCROLLABLE)
@@ -86,13 +102,15 @@ class _BasePanel(lv.obj):
             self.title_label.add_flag(lv.obj.FLAG.FLOATING)
             self.title_label.move_foreground()
 
-        if self.auto_add_styles: apply_styles(self)
+        if self.auto_add_styles: self.session.apply_styles(self)
+        self.attach_overrides()
 
         if self.obj and self.obj_size:
             self.obj.set_size(*self.obj_size)
             self.obj.center()
 
-        if self.auto_add_children: add_children_to_group(self, self.group)
+        if self.auto_add_children: self.build_focus_index()
+        self.configured = True
 
         if self.close_btn: lv.group_focus_obj(self.close_btn)
 
@@ -109,7 +127,9 @@ class _BasePanel(lv.obj):
 
             self.animation(self, start_area, dest_area, shrink=False)
 
-        gc.collect()
+        self.session.collect()
+        if config.manager: config.manager.opened(self)
+        if config.latency: config.latency.configured(self)
 
     def close(self, event=None, **kwargs):
 
@@ -129,18 +149,153 @@ class _BasePanel(lv.obj):
             self.delete()
 
     def cleanup(self):
-        if self.idm:
-            self.idm.pop()
-            self.group.set_focus_cb(None)
+        if self.idm: self.idm.pop()
+        self.group.set_focus_cb(None)  # Drops the reference to the callback and what it captured
 
-        for panel in self.subpanels:
+        for panel in list(self.subpanels):  # Deleting a prefetched panel removes it from the list
             panel.cleanup()
             panel.delete()
         for timer in self.timers:
+            timer.resume()  # Paused timers are never run, so they would never be deleted
             timer.set_repeat_count(0)
         for anim in self.animations:
             anim.custom_del(None)
-        gc.collect()
+        self.focus_index = []
+        self.overrides = []
+        if self.owns_group: self.group.delete()  # After the subpanels, which share it
+        if isinstance(self.parent, _BasePanel) and self in self.parent.opened_panels:
+            self.parent.opened_panels.remove(self)
+        if config.manager: config.manager.forget(self)
+        self.session.collect()
+
+    def build_focus_index(self, obj=None):
+        # Index and group the clickable objects below obj.  Nested panels are skipped since
+        # they index their own children, so each object is only walked once per tree.
+        if obj is None: obj = self
+        for i in range(obj.get_child_cnt()):
+            child = obj.get_child(i)
+            if isinstance(child, _BasePanel):
+                continue
+            if child.has_flag(lv.obj.FLAG.CLICKABLE):
+                self.focus_index.append(child)
+                self.group.add_obj(child)
+            self.build_focus_index(child)
+
+    def add_focusable(self, obj):
+        # Objects added before .post_config() are indexed by .build_focus_index()
+        self.group.add_obj(obj)
+        if self.configured:
+            self.focus_index.append(obj)
+
+    def remove_focusable(self, obj):
+        if obj in self.focus_index:
+            self.focus_index.remove(obj)
+        lv.group_remove_obj(obj)
+
+    def populate_group(self, group=None):
+        # Refill a group from the index without walking the tree
+        group = group if group else self.group
+        self.focus_index = [obj for obj in self.focus_index if obj.is_valid()]
+        for obj in self.focus_index:
+            group.add_obj(obj)
+
+    def apply_settings(self, style_key=None, rotate=None):
+        # Changes the style key and/or rotate setting of this panel, its subpanels and the panels
+        # opened from it, in place.  Styles are applied with one walk of the whole tree.
+        panels = self.panel_tree()
+        for panel in panels:
+            if style_key is not None and type(panel).style_key is None:
+                panel.style_key = style_key
+            if rotate is not None and panel.rotate != rotate:
+                panel.set_rotate(rotate)
+        if style_key is not None:
+            self.session.apply_styles(self)
+            for panel in panels:
+                panel.attach_overrides()
+
+    def add_override(self, obj, style, selector=0):
+        # Use instead of obj.set_style_*() with a style from shared_styles
+        self.overrides.append((obj, style, selector))
+        obj.add_style(style, selector)
+
+    def attach_overrides(self):
+        # Re-adding a style moves it above the ones added by apply_styles.  It's removed first
+        # so repeated calls don't stack copies of it.
+        for obj, style, selector in self.overrides:
+            obj.remove_style(style, selector)
+            obj.add_style(style, selector)
+
+    def panel_tree(self):
+        # This panel, its subpanels and the panels opened from it, breadth first
+        panels = [self]
+        i = 0
+        while i < len(panels):
+            panels.extend(panels[i].subpanels)
+            panels.extend(panels[i].opened_panels)
+            i += 1
+        return panels
+
+    def set_idle(self, idle, scale=10):
+        # Called by IdleManager.  Slows this panel's timers down by scale while idle.
+        if idle == self.idle:
+            return
+        self.idle = idle
+        if idle:
+            self.active_periods = {timer: timer.period for timer in self.timers}
+            for timer in self.timers:
+                timer.set_period(timer.period * scale)
+        else:
+            for timer, period in self.active_periods.items():
+                if timer in self.timers: timer.set_period(period)
+            self.active_periods = {}
+
+    def set_rotate(self, rotate):
+        # Overridden by panels that lay out differently when rotating
+        self.rotate = rotate
+
+    def set_widget_value(self, widget, value):
+        # Used by RemoteDispatcher.  Widget 0 is the panel, n is the nth object in its focus index.
+        # Values are converted to what the target takes; ValueError or TypeError if they can't be.
+        if widget == 0:
+            if hasattr(self, "set_value"): self.set_value(self.value_type(value))
+            return
+        if widget > len(self.focus_index):
+            raise ValueError(f"No widget {widget}")
+        obj = self.focus_index[widget - 1]
+        if obj.has_flag(lv.obj.FLAG.CHECKABLE):
+            if int(value):
+                obj.add_state(lv.STATE.CHECKED)
+            else:
+                obj.clear_state(lv.STATE.CHECKED)
+        elif isinstance(obj, (lv.slider, lv.bar)):
+            obj.set_value(int(value), lv.ANIM.OFF)
+        elif isinstance(obj, lv.arc):
+            obj.set_value(int(value))
+        elif isinstance(obj, lv.label):
+            obj.set_text(str(value))
+        else:
+            raise TypeError(f"Can't set a value on widget {widget}")
+
+    def get_state(self):
+        # Saved by resume.save_state().  Subclasses add the values of their widgets.
+        focused = self.group.get_focused()
+        return {"focus": self.focus_index.index(focused) if focused in self.focus_index else None}
+
+    def set_state(self, state):
+        i = state.get("focus")
+        if i is not None and i < len(self.focus_index):
+            lv.group_focus_obj(self.focus_index[i])
+
+
+def root_panels(disp=None):
+    # The panels on the active screen and top layer of a display
+    disp = disp if disp else lv.disp_get_default()
+    panels = []
+    for layer in (disp.get_scr_act(), disp.get_layer_top()):
+        for i in range(layer.get_child_cnt()):
+            child = layer.get_child(i)
+            if isinstance(child, _BasePanel): panels.append(child)
+    return panels
 
 
 class CustomPanel(_BasePanel):
@@ -161,7 +316,6 @@ class CustomPanel(_BasePanel):
             lv.gridnav_add(obj, lv.GRIDNAV_CTRL.ROLLOVER)
             obj.add_flag(lv.obj.FLAG.CLICK_FOCUSABLE)
         else:
-            obj.clear_flag(lv.obj.FLAG.CLICKABLE)
-            add_children_to_group(obj, self.group)
+            obj.clear_flag(lv.obj.FLAG.CLICKABLE)  # Its children are indexed in .post_config()
 
         self.post_config()
@@ -17,9 +17,36 @@ default_obj_size = (lv.pct(66), lv.pct(66))
 
 animation = animations.spin_grow if platform == 'linux' else None
 
+# Low refresh mode for e-paper and slow SPI displays.  Use Session.set_low_refresh() or
+# refresh.set_low_refresh() to change it for a display.
+low_refresh = False
+refresh_period = 1000  # ms between display refreshes in low refresh mode, unless the session sets one
+
+# Menu items that keep focus for prefetch_dwell ms have their panel built in the background.  0 = off
+prefetch_dwell = 0
+prefetch_max = 2  # Prefetched panels kept per menu
+prefetch_discard = False  # Discard prefetched panels as soon as focus moves to another item
+
+# LivePanels build their subpanels from a timer for up to build_budget ms per tick, showing
+# placeholders until each one is built.  0 = build them all before the LivePanel is shown
+build_budget = 0
+
+# Run pan and rotate focus callbacks once per LVGL timer cycle with the last focused object.
+# A spin of fast_focus_steps or more in one cycle jumps to the object instead of panning.  0 = never
+coalesce_focus = True
+fast_focus_steps = 3
+
+# Set by PanelManager.start() to track the heap used by panels
+manager = None
+
+# Set by LatencyTracker.start() to time panels opened by input
+latency = None
+
 # The following are pointers to functions.
 # Any of them can be set to = do_nothing.
 apply_styles = styles.apply_styles
 default_callback = events.debug_event_cb
 # warn = print
 warn = do_nothing
+# Called with every new panel.  PanelMonitor.start() points this at PanelMonitor.attach
+monitor = do_nothing
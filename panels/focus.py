@@ -0,0 +1,54 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+
+
+class FocusCoalescer:
+    """
+    Runs a group focus callback once per LVGL timer cycle with the last focused object, instead
+    of once per encoder step.  A spin that moves focus fast_steps or more times in one cycle
+    runs fast_cb instead, such as jump_focus_cb in place of pan_focus_cb.
+    """
+    def __init__(self, panel, focus_cb, fast_cb=None, fast_steps=0):
+        self.callback = focus_cb
+        self.fast_cb = fast_cb
+        self.fast_steps = fast_steps
+        self.group = None
+        self.steps = 0  # Focus changes since the last flush
+        self.timer = lv.timer_create_basic()
+        self.timer.set_period(0)
+        self.timer.set_repeat_count(-1)
+        self.timer.set_cb(self.flush)
+        self.timer.pause()
+        panel.timers.append(self.timer)  # Stopped by .cleanup()
+
+    def focus_cb(self, group):
+        self.group = group
+        self.steps += 1
+        if self.steps == 1: self.timer.resume()
+
+    def flush(self, timer=None):
+        self.timer.pause()
+        if not self.steps:
+            return  # Resumed with its panel's timers, not by a focus change
+        steps, self.steps = self.steps, 0
+        if self.fast_cb and self.fast_steps and steps >= self.fast_steps:
+            self.fast_cb(self.group)
+        else:
+            self.callback(self.group)
+
+
+def coalesced(panel, focus_cb, fast_cb=None):
+    # focus_cb, wrapped in the panel's FocusCoalescer if its session coalesces focus changes.
+    # Each panel has one, created the first time; later calls swap its callbacks.  Panels
+    # that share another panel's group don't get one since their callback is replaced.
+    if not panel.session.coalesce_focus or not panel.owns_group:
+        return focus_cb
+    if panel.coalescer is None:
+        panel.coalescer = FocusCoalescer(panel, focus_cb, fast_cb, panel.session.fast_focus_steps)
+    else:
+        panel.coalescer.callback = focus_cb
+        panel.coalescer.fast_cb = fast_cb
+    return panel.coalescer.focus_cb
@@ -0,0 +1,59 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+from .base_panels import root_panels
+
+
+class IdleManager:
+    """
+    Puts the open panels into idle mode when the indevs of an IndevManager have had no input
+    for timeout ms, and back as soon as they do.  Idle panels run their timers scale times
+    slower, clocks tick once a minute and their animations are stopped.
+    """
+    def __init__(self, idm, timeout=30_000, scale=10, poll=100):
+        self.idm = idm
+        self.timeout = timeout
+        self.scale = scale
+        self.poll = poll  # ms between input checks while idle
+        self.idle = False
+        self.timer = None
+
+    def start(self):
+        self.timer = lv.timer_create_basic()
+        self.timer.set_period(self.poll)
+        self.timer.set_repeat_count(-1)
+        self.timer.set_cb(self.check)
+
+    def stop(self):
+        if self.idle: self.set_idle(False)
+        if self.timer:
+            self.timer.set_repeat_count(0)
+            self.timer = None
+
+    def inactive_time(self):
+        # LVGL tracks the time since the last input per display
+        disps = [indev.get_disp() for indev in self.idm.indevs] or [lv.disp_get_default()]
+        return min(disp.get_inactive_time() for disp in disps)
+
+    def check(self, timer):
+        inactive = self.inactive_time()
+        if self.idle != (inactive >= self.timeout):
+            self.set_idle(not self.idle)
+        # While active, don't check again until the timeout could have passed
+        timer.set_period(self.poll if self.idle else max(self.timeout - inactive, self.poll))
+
+    def set_idle(self, idle):
+        self.idle = idle
+        for panel in self.panels():
+            panel.set_idle(idle, self.scale)
+
+    def panels(self):
+        # Every open panel on the displays of the IndevManager's indevs
+        disps = [indev.get_disp() for indev in self.idm.indevs] or [lv.disp_get_default()]
+        panels = []
+        for disp in disps:
+            for root in root_panels(disp):
+                if root not in panels: panels.extend(root.panel_tree())
+        return panels
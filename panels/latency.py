@@ -0,0 +1,165 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+import json
+from time import ticks_us, ticks_diff
+from . import config, _BasePanel
+from .trace import tap
+
+buckets = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # Upper bounds in ms.  Slower goes in a last bucket
+
+
+class LatencyTracker:
+    """
+    Measures the time from an encoder step or click on the indevs of an IndevManager to the
+    first display refresh that follows it, and to the end of .post_config() for a panel it
+    opens.  Only invalidations inside the focused or opened panel count as showing the input,
+    and an input that isn't shown within expire ms is dropped.  Results are kept as histograms
+    per panel class and action ("step", "click" or "open").  read_cbs holds the Python read
+    callback of each indev in idm.indevs, as for InputRecorder.  budgets maps actions to ms;
+    slower actions are reported through config.warn.
+    """
+    def __init__(self, idm, read_cbs, disp=None, budgets=None, expire=1000):
+        self.idm = idm
+        self.expire = expire * 1000  # us
+        self.read_cbs = read_cbs
+        self.disp = disp if disp else lv.disp_get_default()
+        self.budgets = budgets if budgets else {}
+        self.histograms = {}  # (panel class name, action): [count per bucket]
+        self.input = None  # (ticks_us, action) of the input waiting for a refresh
+        self.opened = None  # (ticks_us, panel) of the last panel configured since the input
+        self.dirty = False  # Something was invalidated since the input
+        self.last_pressed = [False] * len(read_cbs)
+
+    def start(self):
+        config.latency = self
+        for i, indev in enumerate(self.idm.indevs):
+            indev.set_read_cb(self.tap(i, self.read_cbs[i]))
+        self.disp.add_event(self.invalidate_event_cb, lv.EVENT.INVALIDATE_AREA, None)
+        self.disp.add_event(self.refresh_event_cb, lv.EVENT.REFR_FINISH, None)
+
+    def stop(self):
+        config.latency = None
+        for i, indev in enumerate(self.idm.indevs):
+            indev.set_read_cb(self.read_cbs[i])
+        self.disp.remove_event_cb(self.invalidate_event_cb)
+        self.disp.remove_event_cb(self.refresh_event_cb)
+
+    def tap(self, i, read_cb):
+        return tap(read_cb, lambda data: self.sample(i, data))
+
+    def sample(self, i, data):
+        pressed = data.state == lv.INDEV_STATE.PRESSED
+        if data.enc_diff:
+            self.begin("step")
+        elif self.last_pressed[i] and not pressed:
+            self.begin("click")  # Menus open on release
+        self.last_pressed[i] = pressed
+
+    def begin(self, action):
+        # An input that arrives before the last one was shown is timed from the first,
+        # unless the first has expired without being shown
+        now = ticks_us()
+        if self.input is None or ticks_diff(now, self.input[0]) > self.expire:
+            self.input = (now, action)
+            self.opened = None
+            self.dirty = False
+
+    def configured(self, panel):
+        # Called at the end of _BasePanel.post_config().  Subpanels finish before their
+        # parent, so the last one seen is the panel that was opened.
+        if self.input:
+            self.opened = (ticks_us(), panel)
+
+    def invalidate_event_cb(self, e):
+        # Only count redraws of the panel the input went to, not clocks or refreshing labels elsewhere
+        if not self.input or self.dirty:
+            return
+        panel = self.opened[1] if self.opened else self.focused_panel()
+        if panel is None or not panel.is_valid():
+            return
+        area, coords = e.get_invalidated_area(), lv.area_t()
+        panel.get_coords(coords)
+        if area.x1 <= coords.x2 and area.x2 >= coords.x1 and area.y1 <= coords.y2 and area.y2 >= coords.y1:
+            self.dirty = True
+
+    def refresh_event_cb(self, e):
+        if not self.input:
+            return
+        start, action = self.input
+        now = ticks_us()
+        if ticks_diff(now, start) > self.expire:
+            self.input = self.opened = None  # Never shown, such as a step past the end of a group
+            return
+        if not self.dirty:
+            return
+        if self.opened:
+            done, panel = self.opened
+            self.record(type(panel).__name__, "open", ticks_diff(done, start))
+        else:
+            panel = self.focused_panel()
+        self.record(type(panel).__name__ if panel else "None", action, ticks_diff(now, start))
+        self.input = self.opened = None
+
+    def focused_panel(self):
+        group = self.idm.indevs[0].get_group() if self.idm.indevs else None
+        obj = group.get_focused() if group else None
+        while obj and not isinstance(obj, _BasePanel):
+            obj = obj.get_parent()
+        return obj
+
+    def record(self, name, action, us):
+        ms = us / 1000
+        histogram = self.histograms.get((name, action))
+        if histogram is None:
+            self.histograms[(name, action)] = histogram = [0] * (len(buckets) + 1)
+        for i, bound in enumerate(buckets):
+            if ms <= bound:
+                break
+        else:
+            i = len(buckets)
+        histogram[i] += 1
+        budget = self.budgets.get(action)
+        if budget and ms > budget:
+            config.warn(f"{name} {action} took {ms:.1f} ms, budget {budget} ms")
+
+    def percentile(self, name, action, p=95):
+        # Upper bound in ms of the bucket holding the pth percentile, None if slower than every bucket
+        histogram = self.histograms.get((name, action))
+        if not histogram:
+            return None
+        target = sum(histogram) * p / 100
+        count = 0
+        for i, n in enumerate(histogram):
+            count += n
+            if count >= target:
+                return buckets[i] if i < len(buckets) else None
+
+    def over_budget(self, p=95):
+        # (name, action) whose pth percentile is slower than the action's budget
+        slow = []
+        for name, action in self.histograms:
+            budget = self.budgets.get(action)
+            ms = self.percentile(name, action, p)
+            if budget and (ms is None or ms > budget):
+                slow.append((name, action))
+        return slow
+
+    def report(self):
+        lines = []
+        for (name, action), histogram in sorted(self.histograms.items()):
+            p50, p95 = self.percentile(name, action, 50), self.percentile(name, action, 95)
+            lines.append(f"{name} {action}: {sum(histogram)} samples, p50 <={p50} ms, p95 <={p95} ms")
+        return "\n".join(lines)
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "buckets": buckets,
+                "histograms": [[name, action, histogram] for (name, action), histogram in self.histograms.items()],
+            }, f)
+
+    def reset(self):
+        self.histograms = {}
@@ -0,0 +1,136 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+from math import sin, cos, pi
+
+# Position tables shared by every RoundLayout.
+# (child count, container width, container height, child size): ((x, y), ...) with slot 0 at the top
+tables = {}
+
+
+def round_positions(count, width, height, child_size):
+    key = (count, width, height, child_size)
+    table = tables.get(key)
+    if table is None:
+        radius = (min(width, height) - child_size) // 2
+        table = tuple(
+            (int(radius * cos(2 * pi * i / count - pi / 2)), int(radius * sin(2 * pi * i / count - pi / 2)))
+            for i in range(count)
+        )
+        tables[key] = table
+    return table
+
+
+class RoundLayout:
+    """
+    Places the children of a view on a circle from a shared position table.  Rotating the ring
+    one step per focus change only shifts which table entry each child uses, so no trigonometry
+    is done after the table is built.
+    """
+    def __init__(self, view):
+        self.view = view
+        self.children = []
+        self.table = None
+        self.offset = 0  # Slots the ring is rotated by
+
+    def arrange(self, children=None):
+        # Lay out the view once, then align every child from the table
+        if children is None:
+            children = [self.view.get_child(i) for i in range(self.view.get_child_cnt())]
+        self.children = children
+        if not children:
+            return
+        self.view.update_layout()
+        child_size = max(children[0].get_width(), children[0].get_height())
+        self.table = round_positions(
+            len(children), self.view.get_content_width(), self.view.get_content_height(), child_size
+        )
+        self.place()
+
+    def place(self):
+        count = len(self.children)
+        for i, child in enumerate(self.children):
+            child.align(lv.ALIGN.CENTER, *self.table[(i - self.offset) % count])
+
+    def replace(self, old, new):
+        # Put new in old's slot, such as a subpanel built in place of its placeholder
+        i = self.children.index(old)
+        self.children[i] = new
+        if self.table:
+            new.align(lv.ALIGN.CENTER, *self.table[(i - self.offset) % len(self.children)])
+
+    def index_of(self, obj):
+        # Index of the child containing obj, or None
+        while obj and obj not in self.children:
+            obj = obj.get_parent()
+        return self.children.index(obj) if obj else None
+
+    def rotate_to(self, obj):
+        # Bring the child containing obj to the top slot
+        offset = self.index_of(obj)
+        if offset is not None and offset != self.offset:
+            self.offset = offset
+            self.place()
+
+
+class RingRotator:
+    """
+    Turns the view of a RoundLayout as one transformed container instead of moving each child.
+    Focus changes only set the target angle, and one timer eases the view toward the latest
+    target, so a fast spin skips the positions in between and each step costs the same for any
+    number of children.  The children turn with the ring.
+    """
+    def __init__(self, layout, period=20, divisor=3, animate=True):
+        self.layout = layout
+        self.view = layout.view
+        self.period = period  # ms between steps of the animation
+        self.divisor = divisor  # Each step covers 1/divisor of the remaining angle
+        self.animate = animate
+        self.angle = 0  # 0.1 degree units, as used by LVGL
+        self.target = 0
+        self.timer = None
+        self.view.update_layout()
+        self.view.set_style_transform_pivot_x(self.view.get_width() // 2, 0)
+        self.view.set_style_transform_pivot_y(self.view.get_height() // 2, 0)
+
+    def rotate_to(self, obj):
+        index = self.layout.index_of(obj)
+        if index is None:
+            return
+        target = -3600 * index // len(self.layout.children)
+        # Take the short way around
+        delta = (target - self.angle) % 3600
+        if delta > 1800: delta -= 3600
+        self.target = self.angle + delta
+        if not self.animate:
+            self.set_angle(self.target)
+        elif self.timer is None and self.target != self.angle:
+            self.timer = lv.timer_create_basic()
+            self.timer.set_period(self.period)
+            self.timer.set_cb(self.step)
+
+    def step(self, timer):
+        remaining = self.target - self.angle
+        if abs(remaining) <= 10:  # Within a degree
+            self.set_angle(self.target)
+        else:
+            self.set_angle(self.angle + int(remaining / self.divisor))
+
+    def set_angle(self, angle):
+        if angle == self.target:
+            self.stop()
+            angle = self.target = angle % 3600
+        self.angle = angle
+        self.view.set_style_transform_angle(angle, 0)
+
+    def stop(self):
+        if self.timer:
+            self.timer.set_repeat_count(0)
+            self.timer = None
+
+    def reset(self):
+        self.stop()
+        self.angle = self.target = 0
+        self.view.set_style_transform_angle(0, 0)
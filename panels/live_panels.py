@@ -4,10 +4,14 @@
 
 import lvgl as lv
 import gc
-from . import _BasePanel, RoundMenuPanel, ZRoundMenuPanel, IndevManager, apply_styles
-from .menu_panels import add_close_menu_item
+from time import ticks_ms, ticks_diff
+from . import _BasePanel, RoundMenuPanel, ZRoundMenuPanel, IndevManager
+from .menu_panels import MenuView, add_close_menu_item
 from tools.custom_views import FlexFlowView
 from tools.focus_callbacks import pan_focus_cb
+from .refresh import jump_focus_cb
+from .focus import coalesced
+from .shared_styles import no_pad, square
 
 
 class CircularLivePanel(RoundMenuPanel):
@@ -17,13 +21,133 @@ class CircularLivePanel(RoundMenuPanel):
     auto_add_children = False
     animation = None
     zoomed = True
+    table_layout = True
+    thumbnails = False  # Show subpanels that don't have focus as static snapshots
+    thumbnail_period = 10_000  # ms between snapshot refreshes, 0 = never
+    staged = None  # (placeholder, item) waiting to be built, see stage_item()
+    snapshots = ()  # Set by .init_thumbnails(), which waits for staged subpanels
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if self.staged:
+            build_staged(self, built=self.layout.replace, done=self.init_thumbnails if self.thumbnails else None)
+        elif self.thumbnails:
+            self.init_thumbnails()
+
+    def init_thumbnails(self):
+        self.thumbs = []  # The lv.img shown in place of each subpanel's content
+        self.snapshots = [None] * len(self.subpanels)
+        self.live = None  # Index of the subpanel that is live
+        for panel in self.subpanels:
+            img = lv.img(panel)
+            img.center()
+            img.add_flag(lv.obj.FLAG.CLICKABLE)
+            self.thumbs.append(img)
+        self.update_layout()
+        for i in range(len(self.subpanels)):
+            self.sleep(i)
+        self.regroup()
+        self.install_focus_cb()
+
+        if self.thumbnail_period:
+            self.refreshing = False
+            timer = lv.timer_create_basic()
+            timer.set_period(self.thumbnail_period)
+            timer.set_repeat_count(-1)
+            timer.set_cb(self.refresh_thumbnails)
+            self.timers.append(timer)
+
+    def set_content_hidden(self, i, hidden):
+        # Hides everything in the subpanel except its thumbnail
+        panel, img = self.subpanels[i], self.thumbs[i]
+        for j in range(panel.get_child_cnt() - 1):
+            if hidden:
+                panel.get_child(j).add_flag(lv.obj.FLAG.HIDDEN)
+            else:
+                panel.get_child(j).clear_flag(lv.obj.FLAG.HIDDEN)
+        if hidden:
+            img.clear_flag(lv.obj.FLAG.HIDDEN)
+        else:
+            img.add_flag(lv.obj.FLAG.HIDDEN)
+
+    def snapshot(self, i):
+        self.thumbs[i].add_flag(lv.obj.FLAG.HIDDEN)
+        snapshot = lv.snapshot_take(self.subpanels[i], lv.COLOR_FORMAT.NATIVE)
+        if snapshot:
+            self.thumbs[i].set_src(snapshot)
+            if self.snapshots[i]: lv.snapshot_free(self.snapshots[i])
+            self.snapshots[i] = snapshot
+
+    def sleep(self, i):
+        self.snapshot(i)
+        self.set_content_hidden(i, True)
+        for timer in self.subpanels[i].timers:
+            timer.pause()
+
+    def wake(self, i):
+        if self.live is not None: self.sleep(self.live)
+        self.live = i
+        panel = self.subpanels[i]
+        self.set_content_hidden(i, False)
+        for timer in panel.timers:
+            timer.resume()
+        self.regroup()
+        if panel.focus_index: lv.group_focus_obj(panel.focus_index[0])
+
+    def regroup(self):
+        # Thumbnails take one place in the group; only the live subpanel's objects are added
+        self.group.remove_all_objs()
+        for i, panel in enumerate(self.subpanels):
+            if i == self.live:
+                panel.populate_group(self.group)
+            else:
+                self.group.add_obj(self.thumbs[i])
+
+    def install_focus_cb(self):
+        self.group.set_focus_cb(self.thumb_focus_cb if self.thumbnails else self.focus_cb)
+
+    def thumb_focus_cb(self, group):
+        if self.focus_cb: self.focus_cb(group)
+        focused = group.get_focused()
+        for i, img in enumerate(self.thumbs):
+            if img is focused:
+                # Wake on the next timer cycle since the group can't be changed in its own focus callback
+                timer = lv.timer_create_basic()
+                timer.set_period(0)
+                timer.set_repeat_count(1)
+                timer.set_cb(lambda t: self.wake(i))
+                return
+
+    def refresh_thumbnails(self, timer):
+        # Let the sleeping subpanels' timers run once, then take the snapshots on the next call
+        self.refreshing = not self.refreshing
+        for i, panel in enumerate(self.subpanels):
+            if i == self.live:
+                continue
+            for panel_timer in panel.timers:
+                if self.refreshing:
+                    panel_timer.resume()
+                    panel_timer.ready()
+                else:
+                    panel_timer.pause()
+            if not self.refreshing:
+                self.set_content_hidden(i, False)
+                self.snapshot(i)
+                self.set_content_hidden(i, True)
+        timer.set_period(100 if self.refreshing else self.thumbnail_period)
+
+    def cleanup(self):
+        if self.thumbnails:
+            for snapshot in self.snapshots:
+                if snapshot: lv.snapshot_free(snapshot)
+            self.snapshots = []
+        super().cleanup()
 
     def add_item(self, title, icon, func, params, callback, parent=None):
         if parent == None:
             parent = self.obj
+        if not self.configured and self.session.build_budget:
+            return stage_item(self, (title, icon, func, params, callback), parent, self.obj.child_size)
         if func == ZRoundMenuPanel or func == CircularLivePanel:
             self.warn(f"Cannot place a {func} on a ZoomedLivePanel.  Changing to RoundMenuPanel.")
             func = RoundMenuPanel
@@ -36,8 +160,7 @@ class CircularLivePanel(RoundMenuPanel):
             group=self.group,
             animation=None,
             size=self.obj.child_size,
-            alignment=self.obj.get_next_child_align(),
-            root=True,
+            root=True,  # Aligned by self.layout once all of the items are added
         )
         self.subpanels.append(panel)
         panel.idm = self.idm
@@ -50,11 +173,12 @@ class HorizontalLivePanel(_BasePanel):
     auto_add_title = False
     auto_add_children = False
     flex_flow = lv.FLEX_FLOW.ROW
+    staged = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.menu_def = self.params.copy()
+        self.menu_def = MenuView(self.params)
         add_close_menu_item(self)
 
         self.obj_size = (lv.pct(100), lv.pct(100))
@@ -65,12 +189,20 @@ class HorizontalLivePanel(_BasePanel):
         for item in self.menu_def:
             self.add_item(*item)
 
-        self.group.set_focus_cb(lambda g: pan_focus_cb(g, self.obj))
+        if self.session.low_refresh:
+            obj.set_scrollbar_mode(lv.SCROLLBAR_MODE.OFF)  # Scrollbars would redraw the whole edge
+            self.group.set_focus_cb(coalesced(self, lambda g: jump_focus_cb(g, self.obj)))
+        else:
+            self.group.set_focus_cb(coalesced(self, lambda g: pan_focus_cb(g, self.obj),
+                                              lambda g: jump_focus_cb(g, self.obj)))
 
         self.post_config()
+        if self.staged: build_staged(self)
 
     def add_item(self, title, icon, func, params, callback, parent=None):
         if parent == None: parent = self.obj
+        if not self.configured and self.session.build_budget:
+            return stage_item(self, (title, icon, func, params, callback), parent, (lv.pct(100), lv.pct(100)))
         if func == ZRoundMenuPanel or func == CircularLivePanel:
             self.warn(f"Cannot place a {func} on a FlexFlowLivePanel.  Changing to RoundMenuPanel.")
             func = RoundMenuPanel
@@ -99,11 +231,12 @@ class TabViewLivePanel(_BasePanel):
     style_key = 0
     auto_add_title = False
     auto_add_close_btn = False
+    staged = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.menu_def = self.params.copy()
+        self.menu_def = MenuView(self.params)
         add_close_menu_item(self)
 
         self.obj_size = (lv.pct(100), lv.pct(100))
@@ -113,29 +246,42 @@ class TabViewLivePanel(_BasePanel):
         self.obj = obj = lv.tabview(self, lv.DIR.LEFT, menu_width)
 
         tab_btns = obj.get_tab_btns()  # The BtnMatrix containing the buttons
-        apply_styles(tab_btns, include_self=True)
-        tab_btns.add_event(
-            lambda e: self.subpanels[e.get_target_obj().get_selected_btn()].idm.peek(),
-            lv.EVENT.VALUE_CHANGED,
-            None,
-        )
-        self.group.add_obj(tab_btns)
+        self.session.apply_styles(tab_btns, include_self=True)
+        self.current_tab = 0
+        tab_btns.add_event(self.tab_changed_cb, lv.EVENT.VALUE_CHANGED, None)
+        self.add_focusable(tab_btns)
         self.group.set_editing(True)
 
         tabs = [None] * len(self.menu_def)
         for i, item in enumerate(self.menu_def):
             tabs[i] = obj.add_tab(item[0])
             self.add_item(*item, parent=tabs[i])
-            tabs[i].set_style_pad_all(0, 0)
-            self.subpanels[i].set_style_radius(0, 0)
+            self.add_override(tabs[i], no_pad())
 
         self.post_config()
 
-        self.subpanels[0].idm.peek()
+        if self.staged:
+            build_staged(self, built=self.tab_built)
+        else:
+            self.subpanels[0].idm.peek()
+
+    def tab_changed_cb(self, e):
+        # Only hand the indevs over when the tab actually changes.  Tabs still being built
+        # take them in .tab_built().
+        i = e.get_target_obj().get_selected_btn()
+        if i != self.current_tab:
+            self.current_tab = i
+            if i < len(self.subpanels): self.subpanels[i].idm.peek()
+
+    def tab_built(self, placeholder, panel):
+        # Building a tab pushes its group, so hand the indevs back to the selected tab
+        if self.current_tab < len(self.subpanels): self.subpanels[self.current_tab].idm.peek()
 
     def add_item(self, title, icon, func, params, callback, parent=None):
         if parent == None:
             parent = self.obj
+        if not self.configured and self.session.build_budget:
+            return stage_item(self, (title, icon, func, params, callback), parent, (lv.pct(100), lv.pct(100)))
         panel = func(
             params=params,
             callback=callback,
@@ -149,9 +295,48 @@ class TabViewLivePanel(_BasePanel):
             obj_size=(lv.pct(95), lv.pct(95)),
             root=True,
         )
+        self.add_override(panel, square())
         self.subpanels.append(panel)
         return panel
 
+def stage_item(self, item, parent, size):
+    # Hold the place of a subpanel until build_staged() builds it
+    placeholder = lv.obj(parent)
+    placeholder.set_size(*size)
+    placeholder.clear_flag(lv.obj.FLAG.SCROLLABLE)
+    placeholder.clear_flag(lv.obj.FLAG.CLICKABLE)  # Keeps it out of the focus index
+    if self.staged is None: self.staged = []
+    self.staged.append((placeholder, item))
+    return placeholder
+
+def build_staged(self, built=None, done=None):
+    """
+    Builds the staged subpanels of a LivePanel in order from an LVGL timer.  Each tick builds
+    at least one and stops once the session's build_budget ms have passed, so the subpanels
+    already built stay responsive.  built(placeholder, panel) is called as each one replaces
+    its placeholder and done() once they all have.
+    """
+    def tick(timer):
+        start = ticks_ms()
+        while self.staged:
+            placeholder, item = self.staged.pop(0)
+            index = placeholder.get_index()
+            panel = self.add_item(*item, parent=placeholder.get_parent())
+            panel.move_to_index(index)
+            if built: built(placeholder, panel)
+            placeholder.delete()
+            if ticks_diff(ticks_ms(), start) >= self.session.build_budget:
+                return
+        timer.set_repeat_count(0)
+        self.timers.remove(timer)
+        if done: done()
+
+    timer = lv.timer_create_basic()
+    timer.set_period(0)
+    timer.set_repeat_count(-1)
+    timer.set_cb(tick)
+    self.timers.append(timer)
+
 # create_panel isn't used yet.  Will try to use it with all live panels in the future
 def create_panel(self, title, icon, func, params, callback, parent, alignment=(lv.ALIGN.CENTER, 0, 0), 
                  no_title=False, obj_size=None, size=(lv.pct(100), lv.pct(100))):
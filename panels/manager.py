@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+import gc
+from time import ticks_ms, ticks_diff
+from . import config
+from .session import sessions, default_session
+from .menu_panels import is_panel_class
+
+
+class PanelManager:
+    """
+    Tracks the heap used by open panels from gc.mem_free() deltas around their construction.
+    When opening a panel would exceed the budget, cached and hidden panels are evicted, least
+    recently used first.  If that isn't enough, animations are disabled rather than failing.
+    """
+    def __init__(self, budget, reserve=8192):
+        self.budget = budget  # bytes the open panels may use
+        self.reserve = reserve  # free heap below which the manager degrades
+        self.costs = {}  # panel: bytes, outermost panels only since they include their subpanels
+        self.estimates = {}  # panel class: bytes measured the last time one was built
+        self.used_at = {}  # panel: ticks_ms of last use
+        self.cached = []  # hidden panels kept for reuse
+        self.pending = []  # (panel, mem_free) for panels under construction, outermost first
+        self.attempt = None  # Every panel started by the current .open(), for .abort()
+        self.degraded = False
+
+    def start(self):
+        config.manager = self
+
+    def stop(self):
+        config.manager = None
+
+    @property
+    def used(self):
+        return sum(self.costs.values())
+
+    def opening(self, panel):
+        # Called by _BasePanel.__init__()
+        self.drop_stale(panel)
+        if not self.pending:
+            estimate = self.estimates.get(type(panel), 0)
+            if self.used + estimate > self.budget:
+                self.make_room(estimate)
+            gc.collect()
+        if self.attempt is not None: self.attempt.append(panel)
+        self.pending.append((panel, gc.mem_free()))
+
+    def drop_stale(self, panel):
+        # Panels still under construction are ancestors of the new one.  Any other pending
+        # entry is left from a construction that raised, wherever the panel was built.
+        ancestors = []
+        obj = panel.get_parent()
+        while obj:
+            ancestors.append(obj)
+            obj = obj.get_parent()
+        self.pending = [item for item in self.pending if any(item[0] is obj for obj in ancestors)]
+
+    def opened(self, panel):
+        # Called at the end of _BasePanel.post_config()
+        if not self.pending or self.pending[-1][0] is not panel:
+            return
+        _, before = self.pending.pop()
+        if not self.pending: gc.collect()  # The session's gc policy may have skipped it
+        free = gc.mem_free()
+        cost = max(before - free, 0)
+        self.estimates[type(panel)] = cost
+        if not self.pending:
+            self.costs[panel] = cost
+            self.touch(panel)
+        if free < self.reserve:
+            self.degrade()
+
+    def forget(self, panel):
+        # Called by _BasePanel.cleanup()
+        self.costs.pop(panel, None)
+        self.used_at.pop(panel, None)
+        if panel in self.cached:
+            self.cached.remove(panel)
+
+    def touch(self, panel):
+        self.used_at[panel] = ticks_ms()
+
+    def cache(self, panel):
+        # Hide a panel so it can be reused with .take() or evicted when memory is needed
+        panel.add_flag(lv.obj.FLAG.HIDDEN)
+        self.cached.append(panel)
+
+    def take(self, cls, title=None):
+        for panel in self.cached:
+            if type(panel) is cls and panel.title == title:
+                self.cached.remove(panel)
+                panel.clear_flag(lv.obj.FLAG.HIDDEN)
+                self.touch(panel)
+                return panel
+        return None
+
+    def candidates(self):
+        # Cached panels first, then other hidden panels, each least recently used first
+        now = ticks_ms()
+        age = lambda panel: -ticks_diff(now, self.used_at.get(panel, now))
+        hidden = [panel for panel in self.costs if panel not in self.cached and panel.has_flag(lv.obj.FLAG.HIDDEN)]
+        return sorted(self.cached, key=age) + sorted(hidden, key=age)
+
+    def make_room(self, needed):
+        for panel in self.candidates():
+            if self.used + needed <= self.budget:
+                return
+            self.evict(panel)
+        if self.used + needed > self.budget:
+            self.degrade()
+
+    def evict(self, panel):
+        config.warn(f"Evicting {type(panel).__name__} to free {self.costs.get(panel, 0)} bytes")
+        panel.idm = None  # A hidden panel doesn't own the indevs, so don't pop them
+        panel.cleanup()
+        panel.delete()
+
+    def degrade(self):
+        if not self.degraded:
+            self.degraded = True
+            config.animation = None
+            for session in list(sessions.values()) + [default_session]:
+                if "animation" in session.settings: session.set(animation=None)
+            config.warn("Panel memory is low.  Animations disabled.")
+
+    def open(self, func, *args, **kwargs):
+        # Build a panel, recovering once from a MemoryError.  Other menu callbacks aren't
+        # retried since they may have side effects.
+        if not is_panel_class(func):
+            return func(*args, **kwargs)
+        for retry in (True, False):
+            self.attempt = []
+            try:
+                return func(*args, **kwargs)
+            except MemoryError:
+                self.abort()
+                if retry:
+                    self.make_room(self.budget)
+                    self.degrade()
+                gc.collect()
+            finally:
+                # Other exceptions propagate, but their panels mustn't stay pending
+                attempt, self.attempt = self.attempt, None
+                self.pending = [item for item in self.pending if not any(item[0] is p for p in attempt)]
+        config.warn(f"Not enough memory to open {func}")
+        return None
+
+    def abort(self):
+        # Clean up and delete the panels left by a failed construction.  Subpanels that were
+        # finished have running timers and may have pushed their group.
+        panels = self.attempt if self.attempt else [item[0] for item in self.pending]
+        self.pending = []
+        for panel in reversed(panels):
+            if getattr(panel, "configured", False):
+                panel.cleanup()
+            else:
+                for timer in getattr(panel, "timers", ()):
+                    timer.set_repeat_count(0)
+        for panel in reversed(panels):
+            if panel.is_valid(): panel.delete()  # Already gone if its parent was deleted first
@@ -3,15 +3,19 @@
 # SPDX-License-Identifier: MIT
 
 import lvgl as lv
-from . import _BasePanel, BtnMatrixPanel, BtnPanel, ListPanel
+from . import config, _BasePanel, BtnMatrixPanel, BtnPanel, ListPanel
 from tools.custom_views import RoundView
-from tools.focus_callbacks import rotate_focus_cb, pan_focus_cb
+from tools.focus_callbacks import pan_focus_cb
+from .layout import RoundLayout, RingRotator
+from .refresh import jump_focus_cb
+from .focus import coalesced
 
 
 class MatrixMenuPanel(BtnMatrixPanel):
     zoomed = False
+    prefetcher = None
     def __init__(self, *args, params, callback=None, **kwargs):
-        menu_def = params.copy()
+        menu_def = params
         menu_length = len(menu_def)
 
         rows = columns = 1
@@ -20,9 +24,9 @@ class MatrixMenuPanel(BtnMatrixPanel):
             if rows * columns < menu_length:
                 columns += 1
 
+        # lv.btnmatrix needs its own map arrays.  The callbacks are created when a button is pressed.
         btn_map = []
         ctrl_map = [1] * menu_length
-        cb_map = []
         one_checked = True
         for r in range(rows):
             for c in range(columns):
@@ -30,34 +34,56 @@ class MatrixMenuPanel(BtnMatrixPanel):
                 if i >= menu_length:
                     break
                 btn_map.append(menu_def[i][0])
-                cb_map.append(create_cb(self, *menu_def[i]))
             btn_map.append("\n")
         btn_map.append("")
 
         bm_params = (btn_map, ctrl_map, one_checked)
         
-        super().__init__(*args, params=bm_params, callback = cb_map, **kwargs)
+        super().__init__(*args, params=bm_params, callback=lambda e, i: create_cb(self, *menu_def[i])(e), **kwargs)
+
+        self.menu_def = menu_def
+        if self.session.prefetch_dwell:
+            # The matrix is a single object, so follow the selected button through key events
+            self.prefetcher = Prefetcher(self)
+            self.obj.add_event(self.selection_event_cb, lv.EVENT.KEY, None)
+            self.obj.add_event(self.selection_event_cb, lv.EVENT.FOCUSED, None)
+            self.obj.add_event(lambda e: self.prefetcher.focus(None), lv.EVENT.DEFOCUSED, None)
+            add_prefetch_reset(self, self.close_btn)
+
+    def selection_event_cb(self, e):
+        i = self.obj.get_selected_btn()
+        if i < len(self.menu_def) and is_panel_class(self.menu_def[i][2]):
+            self.prefetcher.focus(*self.menu_def[i])
+        else:
+            self.prefetcher.focus(None)
 
 class ListMenuPanel(ListPanel):
     zoomed = False
+    prefetcher = None
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        add_prefetch_reset(self, self.close_btn)
 
     def add_item(self, title, icon, func, params, callback):
         btn = self.obj.add_btn(icon, title)
         btn.add_event(create_cb(self, title, icon, func, params, callback, btn), lv.EVENT.SHORT_CLICKED, None)
-        self.group.add_obj(btn)
+        add_prefetch(self, btn, title, icon, func, params, callback)
+        self.add_focusable(btn)
 
 class RoundMenuPanel(_BasePanel):
     close_align = (lv.ALIGN.CENTER, 0, 0)
     title_align = (lv.ALIGN.TOP_LEFT, 0, 0)
     zoomed = False
+    table_layout = False  # Place the items from a shared position table.  Always used with rotate.
+    ring_rotate = False  # With rotate, turn the whole ring as one container instead of moving each item
+    prefetcher = None
+    ring = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.root: self.title_align = (lv.ALIGN.CENTER, 0, 0)
 
-        self.menu_def = self.params.copy()
+        self.menu_def = MenuView(self.params)
         if self.zoomed: add_close_menu_item(self)
 
         self.obj_size = None
@@ -66,17 +92,51 @@ class RoundMenuPanel(_BasePanel):
         for item in self.menu_def:
             self.add_item(*item)
 
-        if self.rotate:
-            self.group.set_focus_cb(lambda g: rotate_focus_cb(g, self.obj, exclude=[self.close_btn]))
-        elif self.zoomed:
-            self.group.set_focus_cb(lambda g: pan_focus_cb(g, self.obj, scroll_gp=True))
+        self.layout = RoundLayout(self.obj)
+        if self.rotate or self.table_layout: self.layout.arrange()
+
+        self.focus_cb = self.make_focus_cb()  # Kept so subclasses can wrap it
+        if self.focus_cb: self.group.set_focus_cb(self.focus_cb)
 
         self.post_config()
+        add_prefetch_reset(self, self.close_btn)
+
+    def make_focus_cb(self):
+        if self.rotate and self.ring_rotate:
+            if not self.ring:
+                self.ring = RingRotator(self.layout, animate=not self.session.low_refresh)
+            return lambda g: self.ring.rotate_to(g.get_focused())
+        elif self.rotate:
+            return coalesced(self, lambda g: self.layout.rotate_to(g.get_focused()))
+        elif self.zoomed and self.session.low_refresh:
+            return coalesced(self, lambda g: jump_focus_cb(g, self.obj))
+        elif self.zoomed:
+            return coalesced(self, lambda g: pan_focus_cb(g, self.obj, scroll_gp=True),
+                             lambda g: jump_focus_cb(g, self.obj))
+        return None
+
+    def set_rotate(self, rotate):
+        super().set_rotate(rotate)
+        if rotate and not self.layout.table:
+            self.layout.arrange()
+        self.layout.offset = 0
+        if self.layout.table: self.layout.place()
+        if self.ring: self.ring.reset()
+        self.focus_cb = self.make_focus_cb()
+        if self.owns_group: self.install_focus_cb()
+
+    def install_focus_cb(self):
+        self.group.set_focus_cb(self.focus_cb)
+
+    def cleanup(self):
+        if self.ring: self.ring.stop()
+        super().cleanup()
 
     def add_item(self, title, icon, func, params, callback):
         btn = self.obj.add_btn(icon, title)
         btn.add_event(create_cb(self, title, icon, func, params, callback, btn), lv.EVENT.SHORT_CLICKED, None)
-        self.group.add_obj(btn)
+        add_prefetch(self, btn, title, icon, func, params, callback)
+        self.add_focusable(btn)
 
 class ZRoundMenuPanel(RoundMenuPanel):
     style_key = 0
@@ -92,36 +152,171 @@ class ZRoundMenuPanel(RoundMenuPanel):
         btn = self.obj.add_btn(icon, title)
         btn.add_event(create_cb(self, title, icon, func, params, callback, btn, self.obj.child_size),
                        lv.EVENT.SHORT_CLICKED, None)
-        self.group.add_obj(btn)
+        add_prefetch(self, btn, title, icon, func, params, callback, self.obj.child_size)
+        self.add_focusable(btn)
 
 
 ###############################################################################################
 
+class MenuView:
+    # Read-only view of a menu definition.  A "Back" item can be placed in front of the
+    # caller's items without copying or modifying them.
+    def __init__(self, items, first=None):
+        self.items = items
+        self.first = first
+
+    def __len__(self):
+        return len(self.items) + (1 if self.first else 0)
+
+    def __getitem__(self, i):
+        if self.first:
+            if i == 0:
+                return self.first
+            i -= 1
+        return self.items[i]
+
+    def __iter__(self):
+        if self.first:
+            yield self.first
+        for item in self.items:
+            yield item
+
 def add_close_menu_item(self):
     if not self.root:
         if type(self) == ZRoundMenuPanel:
-            self.menu_def.insert(0, (self.close_btn_label, self.close_btn_icon, self.close, None, None))
+            self.menu_def.first = (self.close_btn_label, self.close_btn_icon, self.close, None, None)
         else:
-            self.menu_def.insert(0, (self.close_btn_label, self.close_btn_icon, BtnPanel, None, self.close))
+            self.menu_def.first = (self.close_btn_label, self.close_btn_icon, BtnPanel, None, self.close)
 
 def create_cb(self, title, icon, func, params, callback, sender=None, size=None):
     if func == None: func = self.callback
-    
-    return lambda e: func(
-        e,
-        title=title,
-        icon=icon,
-        params=params,
-        callback=callback,
-        sender=sender if sender else self,
-        parent=self,
-        idm=self.idm,
-        size=size if size else self.size,
-        alignment=determine_pos(e, self)
-    )
-
-def determine_pos(e, parent):
+
+    def open_cb(e):
+        # A panel prefetched while the item had focus only needs to be revealed
+        panel = self.prefetcher.take(title) if self.prefetcher else None
+        if panel: return panel
+        return open_panel(
+            func,
+            e,
+            title=title,
+            icon=icon,
+            params=params,
+            callback=callback,
+            sender=sender if sender else self,
+            parent=self,
+            idm=self.idm,
+            size=size if size else self.size,
+            alignment=determine_pos(e.get_target_obj(), self)
+        )
+    return open_cb
+
+def open_panel(func, *args, **kwargs):
+    # Let the PanelManager, if one is running, recover from MemoryErrors
+    if config.manager: return config.manager.open(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+def determine_pos(obj, parent):
     if parent.zoomed:
-        return (lv.ALIGN.TOP_LEFT, e.get_target_obj().get_x(), e.get_target_obj().get_y())
+        return (lv.ALIGN.TOP_LEFT, obj.get_x(), obj.get_y())
     else:
         return (lv.ALIGN.CENTER, 0, 0)
+
+def is_panel_class(func):
+    return isinstance(func, type) and issubclass(func, _BasePanel)
+
+def add_prefetch(self, btn, title, icon, func, params, callback, size=None):
+    if not self.session.prefetch_dwell:
+        return
+    if not is_panel_class(func):
+        return add_prefetch_reset(self, btn)
+    if self.prefetcher is None: self.prefetcher = Prefetcher(self)
+    btn.add_event(lambda e: self.prefetcher.focus(title, icon, func, params, callback, btn, size),
+                  lv.EVENT.FOCUSED, None)
+
+def add_prefetch_reset(self, obj):
+    # Objects that can't be prefetched, such as the close button, still cancel the dwell when focused
+    if not self.session.prefetch_dwell or obj is None:
+        return
+    if self.prefetcher is None: self.prefetcher = Prefetcher(self)
+    obj.add_event(lambda e: self.prefetcher.focus(None), lv.EVENT.FOCUSED, None)
+
+
+class Prefetcher:
+    """
+    Builds the panel behind a menu item, hidden, once focus has stayed on the item for
+    session.prefetch_dwell ms.  At most session.prefetch_max panels are kept, oldest discarded
+    first; with session.prefetch_discard they are discarded as soon as focus moves on.
+    """
+    def __init__(self, menu):
+        self.menu = menu
+        self.panels = []  # (title, panel), oldest first
+        self.timer = None
+        self.focused = None
+
+    def focus(self, title, icon=None, func=None, params=None, callback=None, sender=None, size=None):
+        # title is None when focus moves to something that can't be prefetched
+        self.focused = title
+        if self.timer:
+            self.timer.set_repeat_count(0)
+            self.timer = None
+        if self.menu.session.prefetch_discard:
+            for item in [item for item in self.panels if item[0] != title]:
+                self.discard(item[1])
+        if title is None or any(item[0] == title for item in self.panels):
+            return
+        self.timer = timer = lv.timer_create_basic()
+        timer.set_period(self.menu.session.prefetch_dwell)
+        timer.set_repeat_count(1)
+        timer.set_cb(lambda t: self.build(title, icon, func, params, callback, sender, size))
+
+    def build(self, title, icon, func, params, callback, sender, size):
+        self.timer = None
+        if self.focused != title or not self.menu.is_valid():
+            return
+        menu = self.menu
+        panel = open_panel(
+            func,
+            None,
+            title=title,
+            icon=icon,
+            params=params,
+            callback=callback,
+            sender=sender if sender else menu,
+            parent=menu,
+            idm=None,  # Given the menu's idm when revealed
+            animation=None,
+            size=size if size else menu.size,
+            alignment=determine_pos(sender, menu) if sender else (lv.ALIGN.CENTER, 0, 0),
+        )
+        if panel is None:
+            return
+        panel.add_flag(lv.obj.FLAG.HIDDEN)
+        panel.add_event(lambda e: self.forget(panel), lv.EVENT.DELETE, None)
+        menu.subpanels.append(panel)  # Cleaned up with the menu if never revealed
+        self.panels.append((title, panel))
+        if config.manager: config.manager.cache(panel)  # May be evicted when memory is needed
+        while len(self.panels) > self.menu.session.prefetch_max:
+            self.discard(self.panels[0][1])
+
+    def take(self, title):
+        for item in self.panels:
+            if item[0] == title:
+                panel = item[1]
+                self.forget(panel)
+                if config.manager and panel in config.manager.cached: config.manager.cached.remove(panel)
+                panel.clear_flag(lv.obj.FLAG.HIDDEN)
+                panel.move_foreground()
+                panel.idm = self.menu.idm
+                if panel.idm: panel.idm.push(panel.group)
+                return panel
+        return None
+
+    def forget(self, panel):
+        self.panels = [item for item in self.panels if item[1] is not panel]
+        if panel in self.menu.subpanels:
+            self.menu.subpanels.remove(panel)
+
+    def discard(self, panel):
+        self.forget(panel)
+        panel.cleanup()
+        panel.delete()
@@ -0,0 +1,146 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+from time import ticks_us, ticks_diff
+from . import config, _BasePanel, LabelPanel
+from tools.misc import do_nothing
+
+
+class PanelStats:
+    # Rolling statistics for one panel.  Each list holds one slot per monitor period.
+    def __init__(self, panel, window):
+        self.name = f"{type(panel).__name__}({panel.title})" if panel.title else type(panel).__name__
+        self.area = [0] * window  # Pixels invalidated
+        self.redraws = [0] * window  # Times the panel was drawn
+        self.cb_us = [0] * window  # Time spent in the panel's callbacks
+
+
+class PanelMonitor:
+    """
+    Attributes invalidated area, redraw count and callback time to the panel that owns them.
+    Budgets are per second; a panel exceeding one is reported through config.warn.
+    """
+    def __init__(self, period=1000, window=5, area_budget=None, redraw_budget=None, cb_budget_ms=None, disp=None):
+        self.period = period  # ms per slot
+        self.window = max(window, 2)  # number of slots kept, one of which is in progress
+        self.area_budget = area_budget
+        self.redraw_budget = redraw_budget
+        self.cb_budget_ms = cb_budget_ms
+        self.disp = disp if disp else lv.disp_get_default()
+        self.slot = 0
+        self.panels = {}  # panel: PanelStats
+        self.timer = None
+
+    def start(self):
+        config.monitor = self.attach
+        self.disp.add_event(self.invalidate_event_cb, lv.EVENT.INVALIDATE_AREA, None)
+        self.timer = lv.timer_create_basic()
+        self.timer.set_period(self.period)
+        self.timer.set_repeat_count(-1)
+        self.timer.set_cb(self.roll)
+
+    def stop(self):
+        config.monitor = do_nothing
+        self.disp.remove_event_cb(self.invalidate_event_cb)
+        if self.timer:
+            self.timer.set_repeat_count(0)
+            self.timer = None
+
+    def attach(self, panel):
+        if panel in self.panels:
+            return
+        self.panels[panel] = stats = PanelStats(panel, self.window)
+
+        if type(panel.callback) is list:
+            panel.callback = [self.timed(stats, cb) for cb in panel.callback]
+        elif panel.callback:
+            panel.callback = self.timed(stats, panel.callback)
+
+        panel.add_event(lambda e: self.draw_event_cb(stats), lv.EVENT.DRAW_MAIN_BEGIN, None)
+        panel.add_event(lambda e: self.panels.pop(panel, None), lv.EVENT.DELETE, None)
+
+    def timed(self, stats, func):
+        def wrapper(*args, **kwargs):
+            start = ticks_us()
+            result = func(*args, **kwargs)
+            stats.cb_us[self.slot] += ticks_diff(ticks_us(), start)
+            return result
+        return wrapper
+
+    def draw_event_cb(self, stats):
+        stats.redraws[self.slot] += 1
+
+    def invalidate_event_cb(self, e):
+        area = e.get_invalidated_area()
+        # Panels on the top layer are drawn over the screen, so look there first
+        layer = self.disp.get_layer_top()
+        obj = self.find_obj(layer, area)
+        if obj is layer:
+            obj = self.find_obj(self.disp.get_scr_act(), area)
+        stats = self.panels.get(self.owner(obj))
+        if stats:
+            stats.area[self.slot] += (area.x2 - area.x1 + 1) * (area.y2 - area.y1 + 1)
+
+    def find_obj(self, obj, area):
+        # Descend to the deepest (topmost) object that fully contains the area
+        coords = lv.area_t()
+        while True:
+            for i in range(obj.get_child_cnt() - 1, -1, -1):
+                child = obj.get_child(i)
+                if child.has_flag(lv.obj.FLAG.HIDDEN):
+                    continue  # Cached panels keep their coords but draw nothing
+                child.get_coords(coords)
+                if coords.x1 <= area.x1 and coords.y1 <= area.y1 and coords.x2 >= area.x2 and coords.y2 >= area.y2:
+                    obj = child
+                    break
+            else:
+                return obj
+
+    def owner(self, obj):
+        # Walk up from obj to the _BasePanel that contains it
+        while obj and not isinstance(obj, _BasePanel):
+            obj = obj.get_parent()
+        return obj
+
+    def roll(self, timer=None):
+        for stats in self.panels.values():
+            self.check_budgets(stats)
+        self.slot = (self.slot + 1) % self.window
+        for stats in self.panels.values():
+            stats.area[self.slot] = stats.redraws[self.slot] = stats.cb_us[self.slot] = 0
+
+    def check_budgets(self, stats):
+        scale = 1000 / self.period
+        if self.area_budget and stats.area[self.slot] * scale > self.area_budget:
+            config.warn(f"{stats.name} invalidated {int(stats.area[self.slot] * scale)} px/s")
+        if self.redraw_budget and stats.redraws[self.slot] * scale > self.redraw_budget:
+            config.warn(f"{stats.name} redrew {int(stats.redraws[self.slot] * scale)} times/s")
+        if self.cb_budget_ms and stats.cb_us[self.slot] * scale / 1000 > self.cb_budget_ms:
+            config.warn(f"{stats.name} spent {stats.cb_us[self.slot] * scale / 1000:.1f} ms/s in callbacks")
+
+    def stats(self, panel):
+        # Per second averages over the window, excluding the slot in progress
+        stats = self.panels[panel]
+        seconds = (self.window - 1) * self.period / 1000
+        total = lambda values: sum(values) - values[self.slot]
+        return {
+            "area": total(stats.area) / seconds,
+            "redraws": total(stats.redraws) / seconds,
+            "cb_ms": total(stats.cb_us) / seconds / 1000,
+        }
+
+    def report(self, count=5):
+        rows = [(self.stats(panel), stats.name) for panel, stats in self.panels.items()]
+        rows.sort(key=lambda row: row[0]["area"], reverse=True)
+        return "\n".join(
+            f"{name}: {int(s['area'])}px {s['redraws']:.1f}r {s['cb_ms']:.1f}ms" for s, name in rows[:count]
+        )
+
+    def overlay(self, parent, refresh=None, **kwargs):
+        # The overlay is created with the monitor detached so it doesn't report on itself
+        attach, config.monitor = config.monitor, do_nothing
+        panel = LabelPanel(parent=parent, params=(self.report, refresh if refresh else self.period), root=True, **kwargs)
+        config.monitor = attach
+        return panel
@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Low refresh mode for e-paper and slow SPI displays.  The display is refreshed at a fixed
+# cadence, widget updates are batched to that cadence, panels open without animations and
+# LivePanels jump between pages instead of scrolling.
+
+import lvgl as lv
+
+
+class RefreshBatcher:
+    # Keeps the latest update per object and applies them all at once every period ms
+    def __init__(self, period):
+        self.updates = {}  # obj: func
+        self.timer = lv.timer_create_basic()
+        self.timer.set_period(period)
+        self.timer.set_repeat_count(-1)
+        self.timer.set_cb(self.flush)
+
+    def post(self, obj, func):
+        self.updates[obj] = func
+
+    def flush(self, timer=None):
+        if self.updates:
+            updates, self.updates = self.updates, {}
+            for obj, func in updates.items():
+                if obj.is_valid():  # The panel may have closed since the update was posted
+                    func()
+
+    def stop(self):
+        self.flush()
+        self.timer.set_repeat_count(0)
+
+
+class InvalidationCounter:
+    # Counts invalidations and invalidated pixels reported by a display
+    def __init__(self, disp=None):
+        self.disp = disp if disp else lv.disp_get_default()
+        self.count = 0
+        self.area = 0
+        self.disp.add_event(self.event_cb, lv.EVENT.INVALIDATE_AREA, None)
+
+    def event_cb(self, e):
+        area = e.get_invalidated_area()
+        self.count += 1
+        self.area += (area.x2 - area.x1 + 1) * (area.y2 - area.y1 + 1)
+
+    def reset(self):
+        self.count = self.area = 0
+
+    def stop(self):
+        self.disp.remove_event_cb(self.event_cb)
+
+
+def set_low_refresh(enabled=True, period=None, disp=None):
+    # Low refresh mode for the session of disp, or of the default display
+    from .session import sessions, default_session  # session.py imports this module
+    session = sessions.get(disp if disp else lv.disp_get_default(), default_session)
+    session.set_low_refresh(enabled, period)
+
+def jump_focus_cb(group, view):
+    # Replaces pan_focus_cb in low refresh mode.  Jumps straight to the focused object.
+    obj = group.get_focused()
+    if obj:
+        obj.scroll_to_view_recursive(lv.ANIM.OFF)
@@ -0,0 +1,196 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Framed binary protocol for setting panel values from a host over a UART, pipe or socket.
+#
+# Frame:   0xA5, payload length (uint16), payload, XOR of the payload bytes (uint8)
+# Payload: one or more updates of panel id (uint16), widget (uint8), type (uint8), value
+# Types:   0 = int32, 1 = float32, 2 = string of up to 255 bytes preceded by its length (uint8)
+# All numbers are little endian.  Panel ids are hashed from the titles on the menu path to the
+# panel, so they stay the same when menus are reordered.  Widget 0 is the panel itself.
+
+import lvgl as lv
+import struct
+from . import config
+from .base_panels import root_panels
+
+SYNC = 0xA5
+INT, FLOAT, STR = 0, 1, 2
+header = "<BH"
+update_header = "<HBB"
+value_formats = ("<i", "<f")
+
+
+def make_id(path):
+    # 16 bit FNV-1a of the titles on the path from the root menu
+    h = 0x811C9DC5
+    for title in path:
+        for b in title.encode() + b"/":
+            h = ((h ^ b) * 0x01000193) & 0xFFFFFFFF
+    return (h >> 16) ^ (h & 0xFFFF)
+
+def menu_ids(menu, path=(), ids=None):
+    # {id: path} for every item in a menu definition, for the host's address table
+    ids = {} if ids is None else ids
+    for item in menu:
+        if type(item) is not tuple:
+            continue
+        item_path = path + (item[0],)
+        id = make_id(item_path)
+        if id in ids and ids[id] != item_path:
+            config.warn(f"{'/'.join(item_path)} has the same id as {'/'.join(ids[id])}")
+        ids[id] = item_path
+        if type(item[3]) is list:
+            menu_ids(item[3], item_path, ids)
+    return ids
+
+def encode_frame(updates):
+    # updates is an iterable of (panel id, widget, value).  Used by hosts and tests.
+    payload = bytearray()
+    for id, widget, value in updates:
+        if isinstance(value, str):
+            data = value.encode()
+            payload += struct.pack(update_header, id, widget, STR) + bytes((len(data),)) + data
+        elif isinstance(value, float):
+            payload += struct.pack(update_header, id, widget, FLOAT) + struct.pack(value_formats[FLOAT], value)
+        else:
+            payload += struct.pack(update_header, id, widget, INT) + struct.pack(value_formats[INT], value)
+    check = 0
+    for b in payload:
+        check ^= b
+    return struct.pack(header, SYNC, len(payload)) + payload + bytes((check,))
+
+
+class RemoteDispatcher:
+    """
+    Reads frames from a non-blocking stream with readinto(), such as a UART with timeout=0,
+    a socket after setblocking(False) or an io.BytesIO.  Frames are parsed in place in one
+    preallocated buffer.  The updates read in one timer cycle are applied together, with only
+    the last value per widget set.
+    """
+    def __init__(self, stream, disp=None, period=0, bufsize=512):
+        self.stream = stream
+        self.disp = disp
+        self.buf = bytearray(bufsize)
+        self.mv = memoryview(self.buf)
+        self.fill = 0  # Bytes in buf
+        self.targets = {}  # panel id: panel, rebuilt when an id isn't found
+        self.pending = {}  # (panel id, widget): value
+        self.spare = {}  # Swapped with pending on each apply, as in UpdateQueue
+        self.errors = 0  # Frames dropped for a bad checksum or length
+        self.failures = {}  # panel id: updates that the panel rejected
+        self.rebuilt = False  # .targets was rebuilt during this .apply()
+        self.timer = lv.timer_create_basic()
+        self.timer.set_period(period)
+        self.timer.set_repeat_count(-1)
+        self.timer.set_cb(self.poll)
+
+    def stop(self):
+        self.timer.set_repeat_count(0)
+
+    def poll(self, timer=None):
+        while True:
+            n = self.stream.readinto(self.mv[self.fill:])
+            if not n:
+                break
+            self.fill += n
+            self.parse()
+            if self.fill == len(self.buf):
+                self.fill = 0  # Last resort, parse() only leaves frames that fit
+                self.errors += 1
+        self.apply()
+
+    def parse(self):
+        mv, start, end = self.mv, 0, self.fill
+        while start < end:
+            if mv[start] != SYNC:
+                start += 1
+                continue
+            if end - start < 3:
+                break
+            _, length = struct.unpack_from(header, mv, start)
+            if length + 4 > len(self.buf):
+                self.errors += 1  # Noise that looks like a SYNC byte, or a frame that can never fit
+                start += 1
+                continue
+            if end - start < length + 4:
+                break
+            payload = mv[start + 3:start + 3 + length]
+            check = 0
+            for b in payload:
+                check ^= b
+            if check == mv[start + 3 + length] and self.read_updates(payload):
+                start += length + 4
+            else:
+                self.errors += 1
+                start += 1  # Resync on the next SYNC byte
+        if start:
+            self.buf[:end - start] = mv[start:end]
+            self.fill = end - start
+
+    def read_updates(self, payload):
+        # Queues the updates in a payload, or returns False if the payload is malformed
+        updates = []
+        i, length = 0, len(payload)
+        while i < length:
+            if length - i < 4:
+                return False
+            id, widget, kind = struct.unpack_from(update_header, payload, i)
+            i += 4
+            if kind == STR:
+                if i >= length or i + 1 + payload[i] > length:
+                    return False
+                value = str(bytes(payload[i + 1:i + 1 + payload[i]]), "utf-8")
+                i += 1 + payload[i]
+            elif kind < STR and i + 4 <= length:
+                value = struct.unpack_from(value_formats[kind], payload, i)[0]
+                i += 4
+            else:
+                return False
+            updates.append(((id, widget), value))
+        for key, value in updates:
+            self.pending[key] = value
+        return True
+
+    def apply(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, self.spare
+        self.rebuilt = False
+        try:
+            for (id, widget), value in pending.items():
+                panel = self.find(id)
+                if panel is None:
+                    continue
+                try:
+                    panel.set_widget_value(widget, value)
+                except (ValueError, TypeError, OverflowError) as e:
+                    self.failures[id] = self.failures.get(id, 0) + 1
+                    config.warn(f"Remote update of {type(panel).__name__} widget {widget} failed: {e}")
+        finally:
+            pending.clear()
+            self.spare = pending
+
+    def find(self, id):
+        # The table is rebuilt at most once per .apply(), so unknown ids don't each walk the tree
+        panel = self.targets.get(id)
+        if (panel is None or not panel.is_valid()) and not self.rebuilt:
+            self.targets = self.open_ids()
+            self.rebuilt = True
+            panel = self.targets.get(id)
+        return panel if panel and panel.is_valid() else None
+
+    def open_ids(self):
+        # {id: panel} for the open panels, with each path built from the menu titles
+        targets = {}
+        stack = [(root, ()) for root in root_panels(self.disp)]
+        while stack:
+            panel, path = stack.pop()
+            for i, subpanel in enumerate(panel.subpanels):
+                title = subpanel.title if subpanel.title else panel.menu_def[i][0]
+                stack.append((subpanel, path + (title,)))
+            for opened in panel.opened_panels:
+                if opened.title: stack.append((opened, path + (opened.title,)))
+            if path: targets[make_id(path)] = panel
+        return targets
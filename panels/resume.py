@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Saves the navigation path to the current panel and its widget values, and rebuilds only that
+# panel on the next boot.  Its parents are built one at a time as the user presses Back.
+
+import lvgl as lv
+import json
+from . import _BasePanel
+
+resume_file = "panels_resume.json"
+
+
+def nav_path(panel):
+    # Item indices from the root menu down to panel.  Panels opened from a menu are found by
+    # title in the menu's params, LivePanel subpanels by their place in .subpanels.
+    path = []
+    while True:
+        owner = panel.parent
+        while owner and not isinstance(owner, _BasePanel):
+            owner = owner.get_parent()  # Subpanels sit in a view or tab of their LivePanel
+        if owner is None:
+            break
+        items = owner.params
+        if panel.parent is owner:
+            for i, item in enumerate(items):
+                if type(item) is tuple and item[0] == panel.title:
+                    break
+            else:
+                return []  # Not opened from a menu, so the path can't be followed
+        elif panel in owner.subpanels:
+            # menu_def may have a Back item in front of the params
+            i = owner.subpanels.index(panel) - (1 if getattr(owner, "menu_def", None) and owner.menu_def.first else 0)
+            if not 0 <= i < len(items):
+                return []  # The Back item
+        else:
+            return []
+        path.append(i)
+        panel = owner
+    path.reverse()
+    return path
+
+def save_state(panel, path=resume_file):
+    with open(path, "w") as f:
+        json.dump({"path": nav_path(panel), "state": panel.get_state()}, f)
+
+def load_state(path=resume_file):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def resume(root_cls, params, parent, idm=None, path=resume_file, **kwargs):
+    """
+    Builds the panel that was open when save_state() was called, or root_cls(params=params)
+    if there is nothing to resume.  kwargs are passed to every panel that is built.
+    """
+    saved = load_state(path)
+    nav = saved["path"] if saved else []
+
+    # Walk the menu definitions without building anything
+    defs = [None]
+    items = params
+    for i in nav:
+        if not items or i >= len(items) or type(items[i]) is not tuple:
+            saved = None  # The menus have changed since the state was saved
+            defs = [None]
+            break
+        defs.append(items[i])
+        items = items[i][3]
+
+    def build(level):
+        if level == 0:
+            return root_cls(params=params, parent=parent, idm=idm, root=True, **kwargs)
+        title, icon, func, item_params, callback = defs[level]
+        panel = func(title=title, icon=icon, params=item_params, callback=callback, parent=parent, idm=idm, **kwargs)
+        # Build the parent once this panel has been closed
+        panel.add_event(lambda e: build_later(level - 1), lv.EVENT.DELETE, None)
+        return panel
+
+    def build_later(level):
+        timer = lv.timer_create_basic()
+        timer.set_period(0)
+        timer.set_repeat_count(1)
+        timer.set_cb(lambda t: build(level))
+
+    panel = build(len(defs) - 1)
+    if saved and saved.get("state"): panel.set_state(saved["state"])
+    return panel
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+import gc
+from . import config
+from .refresh import RefreshBatcher
+
+sessions = {}  # display: Session
+
+
+class Session:
+    """
+    Per display settings.  Any attribute of panels.config, such as rotate, animation,
+    panel_style_key or apply_styles, may be overridden with a keyword argument; the rest
+    are read from config.  Panels use the session of the panel or display they are created on.
+    """
+    def __init__(self, disp=None, refresh_period=None, gc_every=1, **settings):
+        self.disp = disp
+        self.settings = settings
+        self.gc_every = gc_every  # Collect every n panel constructions and cleanups.  0 = never
+        self.gc_count = 0
+        self.period = refresh_period  # Display refresh period, config.refresh_period if None
+        self.batcher = None  # Batches widget updates in low refresh mode
+        self.normal_period = 33  # Display refresh period restored when low refresh mode is turned off
+        if disp:
+            sessions[disp] = self
+            if refresh_period: self.set_refresh_period(refresh_period)
+        if settings.get("low_refresh"):
+            settings["low_refresh"] = False
+            self.set_low_refresh(True)
+
+    def __getattr__(self, name):
+        # Only called for names that aren't instance attributes
+        if name in self.settings:
+            return self.settings[name]
+        return getattr(config, name)
+
+    def set(self, **settings):
+        self.settings.update(settings)
+
+    def set_refresh_period(self, period):
+        self.disp.get_refr_timer().set_period(period)
+
+    def low_period(self):
+        return self.period if self.period else config.refresh_period
+
+    def set_low_refresh(self, enabled=True, period=None):
+        # Refreshes the display every period ms and batches widget updates to that cadence
+        if period: self.period = period
+        refr_timer = (self.disp if self.disp else lv.disp_get_default()).get_refr_timer()
+        if enabled and not self.low_refresh:
+            self.normal_period = refr_timer.period
+        refr_timer.set_period(self.low_period() if enabled else self.normal_period)
+        self.settings["low_refresh"] = enabled
+        if self.batcher:
+            self.batcher.stop()
+            self.batcher = None
+        if enabled:
+            self.batcher = RefreshBatcher(self.low_period())
+
+    def post_update(self, obj, func):
+        # Run func now, or at the next refresh in low refresh mode.  Only the last func per obj is run.
+        if self.batcher:
+            self.batcher.post(obj, func)
+        else:
+            func()
+
+    def refresh_period(self, period):
+        # Timers that update widgets don't need to run faster than the display refreshes
+        return max(period, self.low_period()) if self.low_refresh else period
+
+    def collect(self):
+        if self.gc_every:
+            self.gc_count += 1
+            if self.gc_count >= self.gc_every:
+                self.gc_count = 0
+                gc.collect()
+
+    def close(self):
+        if sessions.get(self.disp) is self:
+            sessions.pop(self.disp)
+
+
+default_session = Session()
+
+
+def session_for(obj):
+    # The session of the nearest panel above obj, else the session of obj's display
+    parent = obj
+    while parent:
+        session = getattr(parent, "session", None)
+        if session:
+            return session
+        parent = parent.get_parent()
+    return sessions.get(obj.get_disp(), default_session)
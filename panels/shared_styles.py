@@ -0,0 +1,34 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Styles for the per-object tweaks panels make on top of the applied styles.  Setting a local
+# style gives each object its own style record, which adds up across large LivePanels.  These
+# are created once per key and attached by reference with _BasePanel.add_override().
+
+import lvgl as lv
+
+styles = {}  # key: lv.style_t
+
+
+def shared_style(key, init):
+    style = styles.get(key)
+    if style is None:
+        style = lv.style_t()
+        style.init()
+        init(style)
+        styles[key] = style
+    return style
+
+def no_pad():
+    return shared_style("no_pad", lambda s: s.set_pad_all(0))
+
+def square():
+    return shared_style("square", lambda s: s.set_radius(0))
+
+def no_size():
+    return shared_style("no_size", lambda s: s.set_size(0))
+
+def bg_img(src):
+    # One style per image source, so icons shared between buttons share their style too
+    return shared_style(("bg_img", src), lambda s: s.set_bg_img_src(src))
@@ -0,0 +1,135 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+# Records encoder input against an IndevManager and replays it through a virtual encoder,
+# so navigation sessions can be timed and compared between builds without a human.
+
+import lvgl as lv
+from time import ticks_ms, ticks_diff, sleep_ms
+
+
+def tap(read_cb, sample_cb):
+    # Wraps an indev read callback so sample_cb(data) sees every sample it reads
+    def tapped_read_cb(indev, data):
+        result = read_cb(indev, data)
+        sample_cb(data)
+        return result
+    return tapped_read_cb
+
+
+class VirtualEncoder:
+    # An encoder indev fed from a queue.  Works as a headless stand-in for a real encoder.
+    def __init__(self, group=None):
+        self.queue = []  # (enc_diff, pressed) samples, one consumed per read
+        self.pressed = False
+        self.indev = lv.indev_create()
+        self.indev.set_type(lv.INDEV_TYPE.ENCODER)
+        self.indev.set_read_cb(self.read_cb)
+        if group: self.indev.set_group(group)
+
+    def read_cb(self, indev, data):
+        if self.queue:
+            diff, self.pressed = self.queue.pop(0)
+            data.enc_diff = diff
+        data.state = lv.INDEV_STATE.PRESSED if self.pressed else lv.INDEV_STATE.RELEASED
+
+    def get_indev(self):
+        return self.indev
+
+    def step(self, diff=1):
+        self.queue.append((diff, self.pressed))
+
+    def press(self):
+        self.queue.append((0, True))
+
+    def release(self):
+        self.queue.append((0, False))
+
+    def click(self):
+        self.press()
+        self.release()
+
+    def delete(self):
+        self.indev.delete()
+
+
+class InputRecorder:
+    """
+    Records the samples read by the indevs of an IndevManager.  read_cbs holds the Python read
+    callback of each indev in idm.indevs; each is wrapped so its output is recorded.
+    The trace is a list of (ms, indev index, enc_diff, pressed) with unchanged samples left out.
+    """
+    def __init__(self, idm, read_cbs):
+        self.idm = idm
+        self.read_cbs = read_cbs
+        self.trace = []
+        self.start_time = None
+        self.last_pressed = [False] * len(read_cbs)
+
+    def start(self):
+        self.trace = []
+        self.start_time = ticks_ms()
+        for i, indev in enumerate(self.idm.indevs):
+            indev.set_read_cb(self.tap(i, self.read_cbs[i]))
+
+    def stop(self):
+        for i, indev in enumerate(self.idm.indevs):
+            indev.set_read_cb(self.read_cbs[i])
+        return self.trace
+
+    def tap(self, i, read_cb):
+        return tap(read_cb, lambda data: self.sample(i, data))
+
+    def sample(self, i, data):
+        pressed = data.state == lv.INDEV_STATE.PRESSED
+        if data.enc_diff or pressed != self.last_pressed[i]:
+            self.last_pressed[i] = pressed
+            self.trace.append((ticks_diff(ticks_ms(), self.start_time), i, data.enc_diff, pressed))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            for sample in self.trace:
+                f.write("{} {} {} {:d}\n".format(*sample))
+
+
+def load_trace(path):
+    trace = []
+    with open(path) as f:
+        for line in f:
+            ms, i, diff, pressed = line.split()
+            trace.append((int(ms), int(i), int(diff), pressed == "1"))
+    return trace
+
+
+class InputReplayer:
+    """
+    Feeds a trace to the groups of an IndevManager through a VirtualEncoder.  With realtime
+    the recorded timing is kept, otherwise samples are fed as fast as LVGL reads them.
+    """
+    def __init__(self, idm, trace):
+        self.idm = idm
+        self.trace = trace
+        self.encoder = VirtualEncoder()
+        idm.indevs.append(self.encoder.get_indev())
+        idm.peek()  # Attach the virtual encoder to the current group
+
+    def run(self, realtime=False, settle=2):
+        # Returns the ms taken to play the trace, handling LVGL's timers throughout
+        start = ticks_ms()
+        for ms, _, diff, pressed in self.trace:
+            if realtime:
+                while ticks_diff(ticks_ms(), start) < ms:
+                    lv.task_handler()
+                    sleep_ms(1)
+            self.encoder.queue.append((diff, pressed))
+            while self.encoder.queue:
+                self.encoder.indev.read()  # Don't wait for the indev read timer
+                lv.task_handler()
+        for _ in range(settle):
+            lv.refr_now(None)
+        return ticks_diff(ticks_ms(), start)
+
+    def close(self):
+        self.idm.indevs.remove(self.encoder.get_indev())
+        self.encoder.delete()
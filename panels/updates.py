@@ -0,0 +1,61 @@
+# SPDX-FileCopyrightText: 2023 Brad Barnett
+#
+# SPDX-License-Identifier: MIT
+
+import lvgl as lv
+try:
+    from _thread import allocate_lock
+except ImportError:  # Ports built without threads only have one producer, LVGL's own thread
+    class allocate_lock:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            pass
+
+
+class UpdateQueue:
+    """
+    Lets worker threads update panels.  Producers post (target, value) from any thread and
+    only hold the lock long enough to store the value.  One LVGL timer applies the latest value
+    per target each cycle, so a fast producer costs one widget update per frame, not per sample.
+    A target is a panel with a .set_value() method or any callable taking the value.
+    """
+    def __init__(self, period=0):
+        self.lock = allocate_lock()
+        self.pending = {}  # target: latest value
+        self.spare = {}  # Swapped with pending on each drain so draining doesn't allocate
+        self.timer = lv.timer_create_basic()
+        self.timer.set_period(period)
+        self.timer.set_repeat_count(-1)
+        self.timer.set_cb(self.drain)
+
+    def post(self, target, value):
+        with self.lock:
+            self.pending[target] = value
+
+    def post_many(self, updates):
+        # updates is an iterable of (target, value)
+        with self.lock:
+            for target, value in updates:
+                self.pending[target] = value
+
+    def drain(self, timer=None):
+        if not self.pending:
+            return
+        with self.lock:
+            pending, self.pending = self.pending, self.spare
+        try:
+            for target, value in pending.items():
+                if isinstance(target, lv.obj):
+                    if target.is_valid():  # The panel may have closed after the value was posted
+                        target.set_value(value)
+                else:
+                    target(value)
+        finally:
+            # Even if a setter raised, so pending and spare stay two different dicts
+            pending.clear()
+            self.spare = pending
+
+    def stop(self):
+        self.timer.set_repeat_count(0)
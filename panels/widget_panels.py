@@ -4,13 +4,27 @@
 
 import lvgl as lv
 import time  # for AnalogClockPanel and CalendarPanel
-from . import apply_styles, add_children_to_group
+from array import array  # for ChartPanel and GaugeGridPanel
+import struct  # for CalendarPanel and GaugeGridPanel
 from .base_panels import _BasePanel
+from .shared_styles import bg_img, no_size
 from tools.animations import Animation
 from tools.misc import make_square
 import sys
 
 
+# lv_coord_t is int16 or int32 depending on the LVGL build, and LV_CHART_POINT_NONE is its max
+coord_typecode = "h" if lv.CHART_POINT_NONE <= 32767 else "i"
+coord_size = struct.calcsize(coord_typecode)
+
+def coord(value):
+    # For values stored in array(coord_typecode), which MicroPython would silently truncate
+    value = int(value)
+    if not -lv.CHART_POINT_NONE - 1 <= value < lv.CHART_POINT_NONE:
+        raise ValueError(f"{value} is out of range")
+    return value
+
+
 class AnalogClockPanel(_BasePanel):
     auto_add_title = False
     # title_align=(lv.ALIGN.TOP_LEFT, 0, 0)
@@ -84,11 +98,12 @@ class AnalogClockPanel(_BasePanel):
             )
 
             # Start the animations and save them in a self.animations to be deleted by .cleanup() in .close()
-            self.animations = [anim_hour.start(), anim_min.start(), anim_sec.start()]
+            self.clock_anims = (anim_hour, anim_min, anim_sec)  # Restarted by .set_idle()
+            self.animations = [anim.start() for anim in self.clock_anims]
         else:
             # Create a timer
             timer = lv.timer_create_basic()
-            timer.set_period(1000 // self.clock_res)
+            timer.set_period(self.session.refresh_period(1000 // self.clock_res))
             timer.set_repeat_count(-1)
             timer.set_cb(self.update_clock)
             self.timers.append(timer)
@@ -124,6 +139,32 @@ class AnalogClockPanel(_BasePanel):
         hour = ((hour * 5 * self.clock_res) + (min / 12)) % (self.clock_res * 60)
         return (int(hour), int(min), int(sec))
 
+    def set_idle(self, idle, scale=10):
+        # Minute resolution while idle, with the animations stopped
+        if idle == self.idle:
+            return
+        if idle:
+            super().set_idle(idle, scale)
+            for anim in self.animations:
+                anim.custom_del(None)
+            self.animations = []
+            if self.params:
+                timer = lv.timer_create_basic()
+                timer.set_repeat_count(-1)
+                timer.set_cb(self.update_clock)
+                self.timers.append(timer)
+                self.idle_timer = timer
+            for timer in self.timers:
+                timer.set_period(60_000)
+            self.update_clock(None)
+        else:
+            if self.params:
+                self.idle_timer.set_repeat_count(0)
+                self.timers.remove(self.idle_timer)
+                self.animations = [anim.start() for anim in self.clock_anims]
+            super().set_idle(idle, scale)
+            self.update_clock(None)
+
     def update_clock(self, event):
         hour, min, sec = self.get_time()
         self.obj.set_indicator_value(self.indic_sec, sec % self.scale)
@@ -148,7 +189,7 @@ class ArcPanel(_BasePanel):
         obj.set_bg_angles(0, 270)
         obj.set_range(*range)
         obj.set_value(value)
-        label = lv.label(self)
+        self.label = label = lv.label(self)
 
         obj.add_event(
             lambda e: self.value_changed_event_cb(
@@ -166,14 +207,30 @@ class ArcPanel(_BasePanel):
         self.post_config()
 
     def value_changed_event_cb(self, e, obj, label, callback):
+        self.session.post_update(label, lambda: self.update_label(obj, label))
+
+        if callback:
+            callback(e)
+
+    def update_label(self, obj, label):
         txt = "{:d}".format(obj.get_value())
         label.set_text(txt)
 
         # Rotate the label to the current pos of the arc
         obj.rotate_obj_to_angle(label, -30)
 
-        if callback:
-            callback(e)
+    def set_value(self, value):
+        self.obj.set_value(value)
+        self.update_label(self.obj, self.label)
+
+    def get_state(self):
+        state = super().get_state()
+        state["value"] = self.obj.get_value()
+        return state
+
+    def set_state(self, state):
+        if "value" in state: self.set_value(state["value"])
+        super().set_state(state)
 
 
 class BtnPanel(_BasePanel):
@@ -183,7 +240,7 @@ class BtnPanel(_BasePanel):
         super().__init__(*args, **kwargs)
 
         self.obj = obj = lv.btn(self)
-        obj.set_style_bg_img_src(self.icon, 0)
+        self.add_override(obj, bg_img(self.icon))
 
         if self.title:
             label = lv.label(obj)
@@ -199,33 +256,96 @@ class BtnMatrixPanel(_BasePanel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        btn_map, ctrl_map, one_checked = self.params
+        self.btn_map, self.ctrl_map, one_checked = self.params
+        self.map_index = None  # Button id to btn_map index, built on the first text change
+        self.pending = None  # btn_id: ctrl bits changed, waiting for .commit()
+        self.text_changed = False
+
         self.obj = obj = lv.btnmatrix(self)
-        obj.set_map(btn_map)
-        obj.set_ctrl_map(ctrl_map)
+        obj.set_map(self.btn_map)
+        obj.set_ctrl_map(self.ctrl_map)
         obj.set_one_checked(one_checked)
         obj.set_selected_btn(0)
 
-        obj.add_event(self.event_cb, lv.EVENT.VALUE_CHANGED, None)
+        # Decide how to dispatch once rather than on every press
+        obj.add_event(self.list_event_cb if type(self.callback) is list else self.event_cb, lv.EVENT.VALUE_CHANGED, None)
 
         self.post_config()
 
     def event_cb(self, event):
-        if type(self.callback) is list:
-            self.callback[event.get_target_obj().get_selected_btn()](event)
+        self.callback(event, self.obj.get_selected_btn())
+
+    def list_event_cb(self, event):
+        self.callback[self.obj.get_selected_btn()](event)
+
+    def set_btn_text(self, btn_id, text):
+        # Changes are applied together by .commit() on the next timer cycle
+        self.own_maps()
+        self.btn_map[self.map_index[btn_id]] = text
+        self.text_changed = True
+        self.schedule(btn_id, 0)
+
+    def set_btn_ctrl(self, btn_id, ctrl, enabled=True):
+        self.own_maps()
+        if enabled:
+            self.ctrl_map[btn_id] |= ctrl
         else:
-            self.callback(event, event.get_target_obj().get_selected_btn())
+            self.ctrl_map[btn_id] &= ~ctrl
+        self.schedule(btn_id, ctrl)
+
+    def own_maps(self):
+        # Copy the maps from params the first time they're changed, since they may be shared
+        if self.map_index is None:
+            self.btn_map = list(self.btn_map)
+            self.ctrl_map = list(self.ctrl_map)
+            self.map_index = [i for i, text in enumerate(self.btn_map) if text not in ("\n", "")]
+
+    def schedule(self, btn_id, ctrl):
+        if self.pending is None:
+            self.pending = {}
+            timer = lv.timer_create_basic()
+            timer.set_period(0)
+            timer.set_repeat_count(1)
+            timer.set_cb(self.commit)
+        self.pending[btn_id] = self.pending.get(btn_id, 0) | ctrl
+
+    def commit(self, timer=None):
+        if self.pending is None or not self.obj.is_valid():
+            return
+        if self.text_changed:
+            # Text can only be changed by setting the map, which lays out the matrix once per commit
+            self.obj.set_map(self.btn_map)
+            self.obj.set_ctrl_map(self.ctrl_map)
+        else:
+            # Only touch the bits that were changed, in place
+            for btn_id, changed in self.pending.items():
+                ctrl = self.ctrl_map[btn_id]
+                if changed & ctrl: self.obj.set_btn_ctrl(btn_id, changed & ctrl)
+                if changed & ~ctrl: self.obj.clear_btn_ctrl(btn_id, changed & ~ctrl)
+        self.pending = None
+        self.text_changed = False
 
 
 class CalendarPanel(_BasePanel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        # params is (year, month, day) or (year, month, day, events) where events is an
+        # iterable of (year, month, day) dates to highlight
         if self.params:
-            year, month, day = self.params
+            year, month, day = self.params[0:3]
+            events = self.params[3] if len(self.params) > 3 else None
         else:
             year, month, day = time.localtime()[0:3]
+            events = None
 #        date = lv.calendar_date_t({"year": year, "month": month, "day": day})
+        self.events = {}  # year * 12 + month - 1: bitmask of the days with events
+        # One C array of lv_calendar_date_t (uint16 year, int8 month, int8 day), reused for every
+        # month: up to 31 event days plus the pressed date.  LVGL keeps a pointer to it.
+        self.date_size = lv.calendar_date_t.__SIZE__
+        self.highlights = bytearray(32 * self.date_size)
+        self.pressed = None
+
         self.obj = obj = lv.calendar(self)
         obj.set_showed_date(year, month)
         obj.set_today_date(year, month, day)
@@ -233,26 +353,158 @@ class CalendarPanel(_BasePanel):
         # obj.set_day_names(day_names)
         header=lv.calendar_header_arrow(obj)
         # header=lv.calendar_header_dropdown(obj)
-        apply_styles(header)
+        self.session.apply_styles(header)
         cal_btns = obj.get_btnmatrix()
-        apply_styles(cal_btns)
+        self.session.apply_styles(cal_btns)
         obj.clear_flag(obj.FLAG.CLICKABLE)
-        self.group.add_obj(cal_btns)
-        add_children_to_group(header, self.group)
+        self.add_focusable(cal_btns)  # The header buttons are indexed in .post_config()
 
         obj.add_event(self.value_changed_event_cb, lv.EVENT.VALUE_CHANGED, None)
+        # The header sends VALUE_CHANGED to itself after its arrows change the month
+        header.add_event(lambda e: self.show_events(), lv.EVENT.VALUE_CHANGED, None)
+
+        if events: self.add_events(events)
 
         self.post_config()
 
     def value_changed_event_cb(self, e):
-        obj = e.get_target_obj()
-
-        date = lv.calendar_date_t()
-        self.obj.get_pressed_date(date)
-        self.obj.set_highlighted_dates([date], 1)
+        if self.pressed is None:
+            self.pressed = lv.calendar_date_t()
+        self.obj.get_pressed_date(self.pressed)
+        self.show_events()
 
         self.callback(e)
 
+    def add_events(self, dates):
+        for year, month, day in dates:
+            key = year * 12 + month - 1
+            self.events[key] = self.events.get(key, 0) | (1 << day)
+        self.show_events()
+
+    def clear_events(self):
+        self.events = {}
+        self.show_events()
+
+    def show_events(self):
+        # Highlight the events of the month being shown.  Only that month's bitmask is read.
+        shown = self.obj.get_showed_date()
+        mask = self.events.get(shown.year * 12 + shown.month - 1, 0) >> 1
+        count = 0
+        day = 1
+        while mask:
+            if mask & 1:
+                struct.pack_into("<Hbb", self.highlights, count * self.date_size, shown.year, shown.month, day)
+                count += 1
+            mask >>= 1
+            day += 1
+        if self.pressed:
+            pressed = self.pressed
+            struct.pack_into("<Hbb", self.highlights, count * self.date_size, pressed.year, pressed.month, pressed.day)
+            count += 1
+        self.obj.set_highlighted_dates(self.highlights, count)
+
+
+class ChartPanel(_BasePanel):
+    point_typecode = coord_typecode
+    point_none = lv.CHART_POINT_NONE
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # params is (capacity, (min, max), refresh ms).  Samples are kept in an array(point_typecode) ring buffer.
+        capacity, range, refresh = self.params if self.params else (1000, (0, 99), 50)
+
+        self.samples = array(self.point_typecode, bytes(coord_size * capacity))
+        self.capacity = capacity
+        self.head = 0  # Index of the oldest sample
+        self.count = 0
+        self.changed = False
+        self.points = None  # Decimated min/max pairs, shared with the chart by set_ext_y_array
+
+        self.obj = obj = lv.chart(self)
+        obj.set_type(lv.chart.TYPE.LINE)
+        obj.set_range(lv.chart.AXIS.PRIMARY_Y, *range)
+        obj.set_div_line_count(5, 0)
+        self.add_override(obj, no_size(), lv.PART.INDICATOR)  # No dots on the points
+        self.series = obj.add_series(lv.palette_main(lv.PALETTE.BLUE), lv.chart.AXIS.PRIMARY_Y)
+
+        timer = lv.timer_create_basic()
+        timer.set_period(self.session.refresh_period(refresh))
+        timer.set_repeat_count(-1)
+        timer.set_cb(self.refresh)
+        self.timers.append(timer)
+
+        self.post_config()
+
+    def append(self, value):
+        self.samples[(self.head + self.count) % self.capacity] = value
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.head = (self.head + 1) % self.capacity
+        self.changed = True
+
+    def set_value(self, value):
+        # A value sent to a chart is a new sample
+        self.append(coord(value))
+
+    def extend(self, samples):
+        # Bulk append from an array(point_typecode) or a memoryview of one
+        samples = memoryview(samples)
+        n = len(samples)
+        if n >= self.capacity:
+            self.samples[:] = samples[n - self.capacity:]
+            self.head, self.count = 0, self.capacity
+        else:
+            ring = memoryview(self.samples)
+            start = (self.head + self.count) % self.capacity
+            first = min(n, self.capacity - start)
+            ring[start:start + first] = samples[:first]
+            ring[:n - first] = samples[first:]
+            overflow = self.count + n - self.capacity
+            if overflow > 0:
+                self.head = (self.head + overflow) % self.capacity
+                self.count = self.capacity
+            else:
+                self.count += n
+        self.changed = True
+
+    def clear(self):
+        self.head = self.count = 0
+        self.changed = True
+
+    def span(self, start, end, ring):
+        # Min and max of the samples from logical index start to end, which may wrap
+        a = (self.head + start) % self.capacity
+        b = a + end - start
+        if b <= self.capacity:
+            return min(ring[a:b]), max(ring[a:b])
+        b -= self.capacity
+        return min(min(ring[a:]), min(ring[:b])), max(max(ring[a:]), max(ring[:b]))
+
+    def refresh(self, timer=None):
+        if not self.changed:
+            return
+        self.changed = False
+        if self.points is None:
+            # One min/max pair per pixel column
+            self.obj.update_layout()
+            columns = max(self.obj.get_content_width(), 1)
+            self.points = array(self.point_typecode, [self.point_none] * (2 * columns))
+            self.obj.set_point_count(2 * columns)
+            self.obj.set_ext_y_array(self.series, self.points)
+        columns = len(self.points) // 2
+        ring = memoryview(self.samples)
+        points = self.points
+        used = min(columns, self.count)
+        for i in range(used):
+            low, high = self.span(i * self.count // used, (i + 1) * self.count // used, ring)
+            points[2 * i] = low
+            points[2 * i + 1] = high
+        for i in range(2 * used, 2 * columns):
+            points[i] = self.point_none
+        self.obj.refresh()
+
 
 class ColorWheelPanel(_BasePanel):
     title_align = (lv.ALIGN.CENTER, 0, 0)
@@ -275,7 +527,80 @@ class ColorWheelPanel(_BasePanel):
         self.post_config()
 
 
+class GaugeGridPanel(_BasePanel):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # params is (count, (min, max)) or (count, (min, max), names)
+        count, range = self.params[0:2] if self.params else (9, (0, 99))
+        names = self.params[2] if self.params and len(self.params) > 2 else None
+
+        columns = 1
+        while columns * columns < count:
+            columns += 1
+        size = lv.pct(100 // columns - 2)
+
+        self.count = count
+        self.values = array(coord_typecode, bytes(coord_size * count))  # Last value shown by each gauge
+        self.packed_format = "<{}h".format(count)
+        self.arcs = []
+        self.labels = []
+
+        self.obj = obj = lv.obj(self)
+        obj.set_flex_flow(lv.FLEX_FLOW.ROW_WRAP)
+        obj.set_flex_align(lv.FLEX_ALIGN.SPACE_EVENLY, lv.FLEX_ALIGN.CENTER, lv.FLEX_ALIGN.CENTER)
+        obj.clear_flag(lv.obj.FLAG.CLICKABLE)
+
+        # Plain indicators: no knob, not clickable and not in the group
+        for i in range(count):
+            arc = lv.arc(obj)
+            arc.set_size(size, size)
+            make_square(arc)
+            arc.set_rotation(135)
+            arc.set_bg_angles(0, 270)
+            arc.set_range(*range)
+            arc.set_value(0)
+            arc.remove_style(None, lv.PART.KNOB)
+            arc.clear_flag(lv.obj.FLAG.CLICKABLE)
+            label = lv.label(arc)
+            label.set_text(names[i] + "\n0" if names else "0")
+            label.center()
+            self.arcs.append(arc)
+            self.labels.append(label)
+        self.names = names
+
+        self.post_config()
+
+    def update(self, values):
+        # One call per frame.  values is an array, memoryview or list with one value per gauge.
+        # Only the gauges whose value changed are touched.
+        last = self.values
+        for i in range(self.count):
+            value = values[i]
+            if value != last[i]:
+                self._show(i, value)
+
+    def set_widget_value(self, widget, value):
+        # Widget n is gauge n - 1
+        i = widget - 1
+        if not 0 <= i < self.count:
+            raise ValueError(f"No gauge {widget}")
+        value = coord(value)
+        if value != self.values[i]:
+            self._show(i, value)
+
+    def _show(self, i, value):
+        self.values[i] = value
+        self.arcs[i].set_value(value)
+        self.labels[i].set_text(self.names[i] + "\n" + str(value) if self.names else str(value))
+
+    def update_packed(self, buf, offset=0):
+        # buf holds one little endian int16 per gauge, for example as read from a UART or socket
+        self.update(struct.unpack_from(self.packed_format, buf, offset))
+
+
 class LabelPanel(_BasePanel):
+    value_type = str
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -290,7 +615,7 @@ class LabelPanel(_BasePanel):
         if refresh:
             timer = lv.timer_create_basic()
             self.timers.append(timer)
-            timer.set_period(refresh)
+            timer.set_period(self.session.refresh_period(refresh))
             timer.set_repeat_count(-1)
             if is_str:
                 timer.set_cb(lambda e: obj.set_text(self.txt))
@@ -304,6 +629,9 @@ class LabelPanel(_BasePanel):
 
         self.post_config()
 
+    def set_value(self, value):
+        self.obj.set_text(str(value))
+
 
 class ListPanel(_BasePanel):
     def __init__(self, *args, **kwargs):
@@ -330,7 +658,7 @@ class ListPanel(_BasePanel):
             lv.EVENT.SHORT_CLICKED,
             None,
         )
-        self.group.add_obj(btn)
+        self.add_focusable(btn)
 
 
 class RollerPanel(_BasePanel):
@@ -348,6 +676,15 @@ class RollerPanel(_BasePanel):
 
         self.post_config()
 
+    def get_state(self):
+        state = super().get_state()
+        state["value"] = self.obj.get_selected()
+        return state
+
+    def set_state(self, state):
+        if "value" in state: self.obj.set_selected(state["value"], lv.ANIM.OFF)
+        super().set_state(state)
+
 
 class SliderPanel(_BasePanel):
     def __init__(self, *args, **kwargs):
@@ -360,7 +697,7 @@ class SliderPanel(_BasePanel):
         self.obj = obj = lv.slider(self)
         obj.set_range(*range)
         obj.set_value(value, lv.ANIM.OFF)
-        label = lv.label(self)
+        self.label = label = lv.label(self)
         label.align(lv.ALIGN.CENTER, 0, lv.pct(-15))
 
         obj.add_event(
@@ -376,12 +713,24 @@ class SliderPanel(_BasePanel):
         self.post_config()
 
     def value_changed_event_cb(self, e, obj, label, callback):
-        txt = "{:d}".format(obj.get_value())
-        label.set_text(txt)
+        self.session.post_update(label, lambda: label.set_text("{:d}".format(obj.get_value())))
 
         if callback:
             callback(e)
 
+    def set_value(self, value):
+        self.obj.set_value(value, lv.ANIM.OFF)
+        self.value_changed_event_cb(None, self.obj, self.label, None)
+
+    def get_state(self):
+        state = super().get_state()
+        state["value"] = self.obj.get_value()
+        return state
+
+    def set_state(self, state):
+        if "value" in state: self.set_value(state["value"])
+        super().set_state(state)
+
 
 class TextAreaPanel(_BasePanel):
     def __init__(self, *args, **kwargs):